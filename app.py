@@ -1,22 +1,29 @@
 """
 Afaq Store Bot - Main Application
 """
-import requests
+import uuid
 import web_database
 import auth_database
 from config import Config
 from datetime import datetime
-from utils.logger import logger
+from utils.logger import logger, set_log_context, reset_log_context
 from routes.admin import admin_bp
 from utils.metrics import metrics
 from routes.health import health_bp
 from routes.web_chat import web_chat_bp
 from routes.metrics import metrics_bp
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g
 from services.products import get_product_count
-from concurrent.futures import ThreadPoolExecutor
+from services.intake import create_intake, SHED
+from services.gemini import check_gemini_reachable
+from services.polling import create_poller
+from services.dispatcher import dispatcher
+from services.health import register_health_check, start_health_prober
+from utils.metrics_shards import start_shard_writer
+from utils.request_timing import register_request_timing
 from services.history import conversation_history
-from handlers.telegram import process_telegram_message
+from handlers.telegram import process_telegram_message, get_inline_command, build_inline_command_reply
+from services.webhook import get_webhook_state, get_webhook_url, ensure_webhook_registered, start_webhook_manager
 
 Config.validate()
 
@@ -28,14 +35,78 @@ app.register_blueprint(metrics_bp)
 app.register_blueprint(admin_bp)
 app.register_blueprint(web_chat_bp)
 
-executor = ThreadPoolExecutor(max_workers=Config.MAX_WORKERS)
+@app.before_request
+def bind_request_id():
+    """Tag every log record of this request with a request_id (taken from X-Request-ID when sent)"""
+    g.request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex[:16]
+    g.log_token = set_log_context(request_id=g.request_id)
+
+@app.after_request
+def echo_request_id(response):
+    """Return the request_id so clients can quote it when reporting problems"""
+    if "request_id" in g:
+        response.headers["X-Request-ID"] = g.request_id
+    return response
+
+@app.teardown_request
+def unbind_request_id(exc):
+    if "log_token" in g:
+        reset_log_context(g.pop("log_token"))
+
+register_request_timing(app)
+
+intake = create_intake(process_telegram_message)
+
+def check_executor_saturation():
+    """Health check: report queued Telegram updates waiting for a worker"""
+    stats = intake.stats()
+    status = "degraded" if stats["queued"] >= stats["queue_size"] else "ok"
+    return status, stats
+
+def handle_update(update):
+    """Route one Telegram update; returns a sendMessage payload to answer inline, if any"""
+    command = get_inline_command(update)
+    if command:
+        if intake.is_duplicate(update):
+            metrics.track_intake("duplicate")
+            return None
+        return build_inline_command_reply(update, command)
+
+    if intake.submit(update) == SHED:
+        return intake.busy_reply(update)
+    return None
+
+def send_polled_reply(payload):
+    """Deliver an inline reply for a polled update through the outbound dispatcher"""
+    dispatcher.enqueue(payload["chat_id"], payload["text"])
+
+poller = create_poller(handle_update, send_polled_reply, capacity=intake.wait_for_capacity)
+
+def check_polling():
+    """Health check: the long-polling thread is alive and its last call succeeded"""
+    stats = poller.stats()
+    status = "ok" if stats["alive"] and not stats["failures"] else "degraded"
+    return status, stats
+
+register_health_check("gemini", check_gemini_reachable, critical=False)
+register_health_check("executor", check_executor_saturation, critical=False)
+start_health_prober()
+start_shard_writer()
+if Config.TELEGRAM_MODE == "polling":
+    if Config.TELEGRAM_TOKEN:
+        register_health_check("polling", check_polling, critical=False)
+        poller.start()
+else:
+    start_webhook_manager()
 
 @app.route("/telegram", methods=["POST"])
 def telegram_webhook():
     """Webhook endpoint for Telegram updates"""
     try:
         update = request.get_json()
-        executor.submit(process_telegram_message, update)
+        reply = handle_update(update)
+        if reply:
+            return jsonify(reply), 200
         return jsonify(success=True), 200
     except Exception as e:
         logger.error(f"❌ Error in telegram_webhook: {e}", exc_info=True)
@@ -56,22 +127,20 @@ def home():
         </html>
         """
     try:
+        if Config.TELEGRAM_MODE == "webhook":
+            ensure_webhook_registered(request.host)
+        webhook = get_webhook_state()
         domain = Config.get_webhook_domain(request.host)
-        webhook_url = f"https://{domain}/telegram"
-        set_result = requests.get(
-            f"https://api.telegram.org/bot{Config.TELEGRAM_TOKEN}/setWebhook",
-            params={"url": webhook_url},
-            timeout=10
-        ).json()
+        webhook_url = webhook["url"] or get_webhook_url(request.host)
+        webhook_ok = webhook["registered"]
+        if Config.TELEGRAM_MODE == "polling":
+            webhook_ok = poller.stats()["alive"]
+            webhook_url = "(long polling)"
        
-        webhook_status = "✅ Active" if set_result.get("ok") else "❌ Failed"
-        webhook_color = "#28a745" if set_result.get("ok") else "#dc3545"
-        info_result = requests.get(
-            f"https://api.telegram.org/bot{Config.TELEGRAM_TOKEN}/getWebhookInfo",
-            timeout=10
-        ).json()
+        webhook_status = "✅ Active" if webhook_ok else "❌ Failed"
+        webhook_color = "#28a745" if webhook_ok else "#dc3545"
         
-        pending_updates = info_result.get("result", {}).get("pending_update_count", 0)
+        pending_updates = webhook["pending_update_count"]
         telegram_db_status = '✅ Connected' if Config.TELEGRAM_DATABASE_URL else '❌ Not configured'
         web_db_status = '✅ Connected' if Config.WEB_DATABASE_URL else '❌ Not configured'
         auth_db_status = '✅ Connected' if Config.AUTH_DATABASE_URL else '❌ Not configured'
@@ -211,17 +280,18 @@ def home():
                 <h3>🌐 Server Status</h3>
                 <div class="server-section">
                     <!-- Telegram Server Card -->
-                    <div class="server-card {'active' if set_result.get('ok') else ''}">
+                    <div class="server-card {'active' if webhook_ok else ''}">
                         <h4>
                             <span class="server-icon">📱</span>
                             Telegram Server
-                            <span class="badge {'badge-success' if set_result.get('ok') else 'badge-warning'}">
-                                {'Active' if set_result.get('ok') else 'Inactive'}
+                            <span class="badge {'badge-success' if webhook_ok else 'badge-warning'}">
+                                {'Active' if webhook_ok else 'Inactive'}
                             </span>
                         </h4>
                         <p><strong>Webhook Status:</strong> {webhook_status}</p>
                         <p><strong>Webhook URL:</strong><br><code>{webhook_url}</code></p>
                         <p><strong>Pending Updates:</strong> {pending_updates}</p>
+                        <p><strong>Last Checked:</strong> {webhook["last_checked"] or 'Pending'}</p>
                         <p><strong>Active Conversations:</strong> {len(conversation_history)}</p>
                     </div>
                    
@@ -263,6 +333,7 @@ def home():
                     <h3>🔗 Quick Links</h3>
                     <p>
                         <a href="/health">🏥 Health Check</a> |
+                        <a href="/health/ready">🚦 Readiness</a> |
                         <a href="/metrics">📊 Metrics</a> |
                         <a href="/chat">💬 Web Chat</a>
                     </p>
@@ -303,6 +374,9 @@ if __name__ == "__main__":
     logger.info(f" - Web DB: {'✅ Configured' if Config.WEB_DATABASE_URL else '❌ Not configured'}")
     logger.info(f" - Auth DB: {'✅ Configured' if Config.AUTH_DATABASE_URL else '❌ Not configured'}")
     logger.info("🌐 Servers:")
-    logger.info(f" - Telegram Server: ✅ Will be activated on first webhook")
+    if Config.TELEGRAM_MODE == "polling":
+        logger.info(" - Telegram Server: ✅ Long polling (getUpdates)")
+    else:
+        logger.info(" - Telegram Server: ✅ Webhook registered in the background at startup")
     logger.info(f" - Web Server: ✅ Active on port {Config.PORT}")
     app.run(host="0.0.0.0", port=Config.PORT)
@@ -1,49 +1,72 @@
 """
 Authentication database operations (user accounts only)
 """
-import bcrypt
+import time
+import atexit
+import threading
 from config import Config
-from psycopg2 import pool
+from datetime import datetime
+from database_pool import create_pool, execute_prepared
+from utils.cache import TTLCache
 from utils.logger import logger
+from utils.passwords import hash_password, verify_password, needs_rehash, PasswordHasherBusy
 
 auth_db_pool = None
+pending_last_logins = {}
+pending_last_logins_lock = threading.Lock()
+user_info_cache = TTLCache("user_info", maxsize=Config.USER_INFO_CACHE_SIZE, ttl=Config.USER_INFO_CACHE_TTL)
+
+LOGIN_LOOKUP_SQL = """
+    SELECT user_id, password_hash, is_active
+    FROM users
+    WHERE username = $1
+"""
+
+FLUSH_LAST_LOGINS_SQL = """
+    UPDATE users
+    SET last_login = batch.logged_in_at
+    FROM unnest(%s::integer[], %s::timestamp[]) AS batch(user_id, logged_in_at)
+    WHERE users.user_id = batch.user_id
+"""
+
+UPDATE_PASSWORD_HASH_SQL = """
+    UPDATE users
+    SET password_hash = $2
+    WHERE user_id = $1
+"""
+
+DEACTIVATE_USER_SQL = """
+    UPDATE users
+    SET is_active = FALSE
+    WHERE user_id = $1
+"""
+
+USER_INFO_SQL = """
+    SELECT username, email, created_at, last_login, is_active
+    FROM users
+    WHERE user_id = $1
+"""
 
 def init_auth_db_pool():
     """Initialize auth database connection pool"""
     global auth_db_pool
-    
-    if not Config.AUTH_DATABASE_URL:
-        logger.warning("⚠️  No auth database configured")
-        return
-    
-    try:
-        auth_db_pool = pool.ThreadedConnectionPool(
-            minconn=1,
-            maxconn=5,
-            dsn=Config.AUTH_DATABASE_URL
-        )
-        logger.info("✅ Auth database connection pool created")
-    except Exception as e:
-        logger.error(f"❌ Failed to create auth database pool: {e}")
-        auth_db_pool = None
+    auth_db_pool = create_pool(
+        "auth",
+        Config.AUTH_DATABASE_URL,
+        minconn=Config.AUTH_DB_POOL_MIN,
+        maxconn=Config.AUTH_DB_POOL_MAX
+    )
 
 def get_auth_db_connection():
     """Get a connection from auth database pool"""
     if auth_db_pool:
-        try:
-            return auth_db_pool.getconn()
-        except Exception as e:
-            logger.error(f"Error getting auth DB connection: {e}")
-            return None
+        return auth_db_pool.getconn()
     return None
 
 def release_auth_db_connection(conn):
     """Release connection back to auth database pool"""
     if auth_db_pool and conn:
-        try:
-            auth_db_pool.putconn(conn)
-        except Exception as e:
-            logger.error(f"Error releasing auth DB connection: {e}")
+        auth_db_pool.putconn(conn)
 
 def init_auth_database_tables():
     """Initialize auth database tables (users only)"""
@@ -86,27 +109,18 @@ def init_auth_database_tables():
     finally:
         release_auth_db_connection(conn)
 
-def hash_password(password):
-    """Hash a password"""
-    salt = bcrypt.gensalt()
-    return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
-
-def verify_password(password, password_hash):
-    """Verify password"""
-    return bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
-
 def register_user(username, email, password):
-    """Register new user"""
+    """Register new user (raises PasswordHasherBusy when hashing is saturated)"""
     if not Config.AUTH_DATABASE_URL:
         return None, "Auth database not configured"
     
+    password_hash = hash_password(password)
+    
     conn = get_auth_db_connection()
     if not conn:
         return None, "Database connection failed"
     
     try:
-        password_hash = hash_password(password)
-        
         with conn.cursor() as cur:
             cur.execute("""
                 INSERT INTO users (username, email, password_hash)
@@ -136,7 +150,7 @@ def register_user(username, email, password):
         release_auth_db_connection(conn)
 
 def authenticate_user(username, password):
-    """Authenticate user"""
+    """Authenticate user (raises PasswordHasherBusy when hashing is saturated)"""
     if not Config.AUTH_DATABASE_URL:
         return None, "Auth database not configured"
     
@@ -145,63 +159,161 @@ def authenticate_user(username, password):
         return None, "Database connection failed"
     
     try:
+        conn.autocommit = True
         with conn.cursor() as cur:
-            cur.execute("""
-                SELECT user_id, password_hash, is_active 
-                FROM users 
-                WHERE username = %s
-            """, (username,))
+            execute_prepared(cur, "login_lookup", LOGIN_LOOKUP_SQL, (username,))
             row = cur.fetchone()
-        
-        if not row:
-            return None, "Invalid username or password"
-        
-        user_id, password_hash, is_active = row
-        
-        if not is_active:
-            return None, "Account is deactivated"
-        
+    except Exception as e:
+        logger.error(f"❌ Authentication error: {e}")
+        return None, "Authentication failed"
+    finally:
+        release_auth_db_connection(conn)
+    
+    if not row:
+        return None, "Invalid username or password"
+    
+    user_id, password_hash, is_active = row
+    
+    if not is_active:
+        return None, "Account is deactivated"
+    
+    try:
         if not verify_password(password, password_hash):
             return None, "Invalid username or password"
         
-        with conn.cursor() as cur:
-            cur.execute("""
-                UPDATE users 
-                SET last_login = CURRENT_TIMESTAMP 
-                WHERE user_id = %s
-            """, (user_id,))
-        conn.commit()
-        
-        logger.info(f"✅ User authenticated: {username} (ID: {user_id})")
-        return user_id, None
-        
+        if needs_rehash(password_hash):
+            rehash_password(user_id, password)
+    except PasswordHasherBusy:
+        raise
     except Exception as e:
         logger.error(f"❌ Authentication error: {e}")
         return None, "Authentication failed"
-        
+    
+    record_last_login(user_id)
+    invalidate_user_info(user_id)
+    logger.info(f"✅ User authenticated: {username} (ID: {user_id})")
+    return user_id, None
+
+def rehash_password(user_id, password):
+    """Upgrade a stored hash to the configured bcrypt cost"""
+    try:
+        new_hash = hash_password(password)
+    except PasswordHasherBusy:
+        # The login already succeeded; the upgrade is retried on the next login
+        logger.warning(f"⚠️  Hashing pool busy, skipped rehash for user {user_id}")
+        return
+    
+    conn = get_auth_db_connection()
+    if not conn:
+        return
+    
+    try:
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            execute_prepared(cur, "update_password_hash", UPDATE_PASSWORD_HASH_SQL, (user_id, new_hash))
+        logger.info(f"🔐 Rehashed password for user {user_id} (cost {Config.BCRYPT_ROUNDS})")
+    except Exception as e:
+        logger.warning(f"⚠️  Could not rehash password for user {user_id}: {e}")
+    finally:
+        release_auth_db_connection(conn)
+
+def record_last_login(user_id):
+    """Buffer a last_login timestamp for the next batched flush"""
+    with pending_last_logins_lock:
+        pending_last_logins[user_id] = datetime.now()
+
+def flush_last_logins():
+    """Write all buffered last_login timestamps in one UPDATE"""
+    with pending_last_logins_lock:
+        if not pending_last_logins:
+            return 0
+        batch = dict(pending_last_logins)
+        pending_last_logins.clear()
+    
+    conn = get_auth_db_connection()
+    if not conn:
+        _requeue_last_logins(batch)
+        return 0
+    
+    try:
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute(FLUSH_LAST_LOGINS_SQL, (list(batch.keys()), list(batch.values())))
+        return len(batch)
+    except Exception as e:
+        logger.error(f"❌ Error flushing last_login updates: {e}")
+        _requeue_last_logins(batch)
+        return 0
+    finally:
+        release_auth_db_connection(conn)
+
+def _requeue_last_logins(batch):
+    """Put a failed batch back without overwriting newer logins"""
+    with pending_last_logins_lock:
+        for user_id, logged_in_at in batch.items():
+            pending_last_logins.setdefault(user_id, logged_in_at)
+
+def last_login_flush_loop():
+    """Background task to periodically flush last_login updates"""
+    while True:
+        time.sleep(Config.LAST_LOGIN_FLUSH_INTERVAL)
+        flush_last_logins()
+
+def invalidate_user_info(user_id):
+    """Drop a user's cached profile"""
+    user_info_cache.invalidate(user_id)
+
+def deactivate_user(user_id):
+    """Deactivate a user account"""
+    if not Config.AUTH_DATABASE_URL:
+        return False
+    
+    conn = get_auth_db_connection()
+    if not conn:
+        return False
+    
+    try:
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            execute_prepared(cur, "deactivate_user", DEACTIVATE_USER_SQL, (user_id,))
+        logger.info(f"🚫 User deactivated (ID: {user_id})")
+        return True
+    except Exception as e:
+        logger.error(f"❌ Error deactivating user: {e}")
+        return False
     finally:
+        invalidate_user_info(user_id)
         release_auth_db_connection(conn)
 
+def _with_pending_last_login(user_info):
+    """Copy a profile, overlaying a last_login that has not been flushed yet"""
+    user_info = dict(user_info)
+    pending = pending_last_logins.get(user_info["user_id"])
+    if pending:
+        user_info["last_login"] = pending
+    return user_info
+
 def get_user_info(user_id):
-    """Get user information"""
+    """Get user information (served from a TTL cache when possible)"""
     if not Config.AUTH_DATABASE_URL:
         return None
     
+    cached = user_info_cache.get(user_id)
+    if cached is not None:
+        return _with_pending_last_login(cached)
+    
     conn = get_auth_db_connection()
     if not conn:
         return None
     
     try:
+        conn.autocommit = True
         with conn.cursor() as cur:
-            cur.execute("""
-                SELECT username, email, created_at, last_login, is_active
-                FROM users 
-                WHERE user_id = %s
-            """, (user_id,))
+            execute_prepared(cur, "user_info", USER_INFO_SQL, (user_id,))
             row = cur.fetchone()
         
         if row:
-            return {
+            user_info = {
                 "user_id": user_id,
                 "username": row[0],
                 "email": row[1],
@@ -209,6 +321,8 @@ def get_user_info(user_id):
                 "last_login": row[3],
                 "is_active": row[4]
             }
+            user_info_cache.set(user_id, user_info)
+            return _with_pending_last_login(user_info)
         return None
         
     except Exception as e:
@@ -249,3 +363,8 @@ def get_user_by_username(username):
 
 init_auth_db_pool()
 init_auth_database_tables()
+
+if Config.AUTH_DATABASE_URL:
+    last_login_thread = threading.Thread(target=last_login_flush_loop, daemon=True)
+    last_login_thread.start()
+    atexit.register(flush_last_logins)
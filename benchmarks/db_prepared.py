@@ -0,0 +1,150 @@
+"""
+Benchmark plain vs prepared hot SQL paths against a local PostgreSQL
+
+Usage:
+    BENCH_DATABASE_URL=postgresql://localhost/afaq_bench python benchmarks/db_prepared.py [iterations]
+
+Creates throwaway tables prefixed with bench_, runs each query path in the
+original style (BEGIN / statement / COMMIT with full SQL text) and in the
+prepared style (one EXECUTE in autocommit), and reports queries per second.
+"""
+import os
+import sys
+import json
+import time
+import psycopg2
+from psycopg2.extras import Json
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database_pool import PooledConnection, execute_prepared
+
+HISTORY = [{"role": "user", "content": "مرحبا" * 20, "timestamp": "2024-01-01 12:00"}] * 20
+
+def setup(conn):
+    """Create benchmark tables"""
+    with conn.cursor() as cur:
+        cur.execute("""
+            DROP TABLE IF EXISTS bench_conversations;
+            DROP TABLE IF EXISTS bench_users;
+            CREATE TABLE bench_conversations (
+                user_key TEXT PRIMARY KEY,
+                history JSONB NOT NULL DEFAULT '[]'::jsonb,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+            CREATE TABLE bench_users (
+                user_id SERIAL PRIMARY KEY,
+                username VARCHAR(100) UNIQUE NOT NULL,
+                password_hash TEXT NOT NULL,
+                last_login TIMESTAMP,
+                is_active BOOLEAN DEFAULT TRUE
+            );
+            INSERT INTO bench_users (username, password_hash)
+            SELECT 'user' || i, 'x' FROM generate_series(1, 1000) AS i;
+        """)
+    conn.commit()
+
+def teardown(conn):
+    """Drop benchmark tables"""
+    conn.rollback()
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute("DROP TABLE IF EXISTS bench_conversations; DROP TABLE IF EXISTS bench_users")
+
+def upsert_plain(conn, i):
+    """Original conversation upsert"""
+    with conn.cursor() as cur:
+        cur.execute("""
+            INSERT INTO bench_conversations (user_key, history, updated_at)
+            VALUES (%s, %s, CURRENT_TIMESTAMP)
+            ON CONFLICT (user_key)
+            DO UPDATE SET history = EXCLUDED.history, updated_at = CURRENT_TIMESTAMP
+        """, (f"telegram:{i % 100}", Json(HISTORY)))
+    conn.commit()
+
+def upsert_prepared(conn, i):
+    """Prepared conversation upsert"""
+    with conn.cursor() as cur:
+        execute_prepared(cur, "bench_upsert", """
+            INSERT INTO bench_conversations (user_key, history, updated_at)
+            VALUES ($1, $2, CURRENT_TIMESTAMP)
+            ON CONFLICT (user_key)
+            DO UPDATE SET history = EXCLUDED.history, updated_at = CURRENT_TIMESTAMP
+        """, (f"telegram:{i % 100}", Json(HISTORY)))
+
+def login_plain(conn, i):
+    """Original login lookup and last_login update"""
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT user_id, password_hash, is_active FROM bench_users WHERE username = %s
+        """, (f"user{i % 1000 + 1}",))
+        user_id = cur.fetchone()[0]
+    with conn.cursor() as cur:
+        cur.execute("UPDATE bench_users SET last_login = CURRENT_TIMESTAMP WHERE user_id = %s", (user_id,))
+    conn.commit()
+
+def login_prepared(conn, i):
+    """Prepared login lookup and last_login update"""
+    with conn.cursor() as cur:
+        execute_prepared(cur, "bench_login_lookup", """
+            SELECT user_id, password_hash, is_active FROM bench_users WHERE username = $1
+        """, (f"user{i % 1000 + 1}",))
+        user_id = cur.fetchone()[0]
+        execute_prepared(cur, "bench_touch_login", """
+            UPDATE bench_users SET last_login = CURRENT_TIMESTAMP WHERE user_id = $1
+        """, (user_id,))
+
+def user_info_plain(conn, i):
+    """Original user info lookup"""
+    with conn.cursor() as cur:
+        cur.execute("SELECT username, last_login, is_active FROM bench_users WHERE user_id = %s", (i % 1000 + 1,))
+        cur.fetchone()
+    conn.rollback()
+
+def user_info_prepared(conn, i):
+    """Prepared user info lookup"""
+    with conn.cursor() as cur:
+        execute_prepared(cur, "bench_user_info", """
+            SELECT username, last_login, is_active FROM bench_users WHERE user_id = $1
+        """, (i % 1000 + 1,))
+        cur.fetchone()
+
+def run(fn, conn, iterations):
+    """Run a query path and return queries per second"""
+    start = time.perf_counter()
+    for i in range(iterations):
+        fn(conn, i)
+    return iterations / (time.perf_counter() - start)
+
+def main():
+    """Run all benchmarks and print JSON results"""
+    dsn = os.getenv("BENCH_DATABASE_URL")
+    if not dsn:
+        sys.exit("BENCH_DATABASE_URL is not set")
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    conn = psycopg2.connect(dsn, connection_factory=PooledConnection)
+    try:
+        setup(conn)
+        results = {}
+        for name, plain, prepared in [
+            ("conversation_upsert", upsert_plain, upsert_prepared),
+            ("login", login_plain, login_prepared),
+            ("user_info", user_info_plain, user_info_prepared),
+        ]:
+            conn.autocommit = False
+            before = run(plain, conn, iterations)
+            conn.autocommit = True
+            after = run(prepared, conn, iterations)
+            results[name] = {
+                "before_qps": round(before, 1),
+                "after_qps": round(after, 1),
+                "speedup": round(after / before, 2)
+            }
+        print(json.dumps({"iterations": iterations, "results": results}, indent=2))
+    finally:
+        teardown(conn)
+        conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+"""
+Offline end-to-end benchmark of /telegram and /api/chat/send
+
+Usage:
+    python benchmarks/e2e.py [--scenario all|telegram|web] [--requests 200] [--concurrency 8]
+                             [--gemini-latency 0.5] [--output-tokens 150] [--output results.json]
+
+Runs the real Flask app on a local port with models.CLIENT replaced by a fake
+Gemini client and TELEGRAM_API_URL pointed at a local Bot API stub, so nothing
+leaves the machine. Databases are left unconfigured (the app's in-memory mode)
+unless --database-url / BENCH_DATABASE_URL names a local PostgreSQL, which is
+then used for all three pools.
+
+/telegram is reported twice: the webhook acknowledgement, and the reply
+delivered to the stub (update posted -> sendMessage received). Replies go
+through the outbound dispatcher, so TELEGRAM_GLOBAL_RATE and
+TELEGRAM_PER_CHAT_RATE from the environment cap reply throughput as they
+would in production.
+"""
+import os
+import sys
+import json
+import math
+import time
+import argparse
+import threading
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fakes import FakeGeminiClient, TelegramStub
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scenario", choices=("all", "telegram", "web"), default="all")
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--users", type=int, default=1000, help="distinct chats / web users to spread requests over")
+    parser.add_argument("--gemini-latency", type=float, default=0.5, help="seconds per fake Gemini call")
+    parser.add_argument("--gemini-jitter", type=float, default=0.1)
+    parser.add_argument("--gemini-error-rate", type=float, default=0.0)
+    parser.add_argument("--output-tokens", type=int, default=150, help="tokens in each fake Gemini reply")
+    parser.add_argument("--telegram-latency", type=float, default=0.0, help="seconds per Bot API stub call")
+    parser.add_argument("--drain-timeout", type=float, default=60, help="seconds to wait for Telegram replies")
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL", ""))
+    parser.add_argument("--output", help="write JSON results to this file instead of stdout")
+    return parser.parse_args()
+
+def configure_environment(args, telegram_url):
+    """Point the app at the fakes before any app module reads Config"""
+    os.environ["TELEGRAM_API_URL"] = telegram_url
+    os.environ["TELEGRAM_MODE"] = "webhook"
+    os.environ["TELEGRAM_TOKEN"] = "bench:token"
+    os.environ["GEMINI_API_KEY"] = "bench"
+    os.environ["METRICS_MULTIPROC_DIR"] = ""
+    # Set explicitly (even empty) so a local .env can never point a run at a real database
+    for name in ("TELEGRAM_DATABASE_URL", "WEB_DATABASE_URL", "AUTH_DATABASE_URL"):
+        os.environ[name] = args.database_url
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    # One process, so it gets the whole Telegram rate budget unless told otherwise
+    os.environ.setdefault("WEB_CONCURRENCY", "1")
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, math.ceil(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+def latency_summary(seconds):
+    values = sorted(seconds)
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean_ms": round(sum(values) / len(values) * 1000, 2),
+        **{f"p{q}_ms": round(percentile(values, q) * 1000, 2) for q in (50, 90, 95, 99)},
+        "max_ms": round(values[-1] * 1000, 2)
+    }
+
+def drive(send, total, concurrency):
+    """Call send(i, session) total times with concurrency requests in flight"""
+    import requests
+
+    counter = itertools.count()
+    results = []
+    lock = threading.Lock()
+
+    def worker():
+        session = requests.Session()
+        local = []
+        while True:
+            i = next(counter)
+            if i >= total:
+                break
+            start = time.perf_counter()
+            try:
+                outcome = send(i, session)
+            except Exception as e:
+                outcome = type(e).__name__
+            local.append((time.perf_counter() - start, outcome))
+        with lock:
+            results.extend(local)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    elapsed = time.perf_counter() - start
+
+    outcomes = {}
+    for _, outcome in results:
+        outcomes[str(outcome)] = outcomes.get(str(outcome), 0) + 1
+    errors = sum(count for outcome, count in outcomes.items() if not outcome.startswith("2"))
+    return {
+        "requests": len(results),
+        "concurrency": concurrency,
+        "duration_seconds": round(elapsed, 3),
+        "throughput_rps": round(len(results) / elapsed, 2) if elapsed else None,
+        "latency": latency_summary([latency for latency, _ in results]),
+        "outcomes": outcomes,
+        "error_rate": round(errors / len(results), 4) if results else None
+    }
+
+def run_telegram(args, base_url, stub):
+    """POST text updates to /telegram and wait for the replies to reach the stub"""
+    update_ids = itertools.count(1)
+    inline_replies = []
+
+    def send(i, session):
+        chat_id = 100000 + i % args.users
+        update = {
+            "update_id": next(update_ids),
+            "message": {
+                "message_id": i,
+                "chat": {"id": chat_id, "type": "private"},
+                "from": {"id": chat_id, "first_name": "bench"},
+                "text": f"عندكم لابتوب رقم {i}؟"
+            }
+        }
+        stub.expect(chat_id)
+        response = session.post(f"{base_url}/telegram", json=update, timeout=30)
+        if response.ok and response.json().get("method") == "sendMessage":
+            stub.cancel(chat_id)
+            inline_replies.append(chat_id)
+        return response.status_code
+
+    start = time.perf_counter()
+    result = drive(send, args.requests, args.concurrency)
+
+    deadline = time.perf_counter() + args.drain_timeout
+    while stub.pending() and time.perf_counter() < deadline:
+        time.sleep(0.05)
+    drained = time.perf_counter() - start
+
+    delivered = len(stub.reply_latencies)
+    result["replies"] = {
+        "delivered": delivered,
+        "inline_busy_replies": len(inline_replies),
+        "missing": max(0, args.requests - delivered - len(inline_replies)),
+        "throughput_rps": round(delivered / drained, 2) if drained else None,
+        "latency": latency_summary(stub.reply_latencies)
+    }
+    return result
+
+def run_web(args, base_url, app):
+    """POST chat messages to /api/chat/send as logged-in users"""
+    serializer = app.session_interface.get_signing_serializer(app)
+    cookie_name = app.config.get("SESSION_COOKIE_NAME", "session")
+    cookies = {}
+
+    def send(i, session):
+        user_id = i % args.users + 1
+        if user_id not in cookies:
+            cookies[user_id] = serializer.dumps({"user_id": user_id, "username": f"bench{user_id}"})
+        response = session.post(
+            f"{base_url}/api/chat/send",
+            json={"message": f"عايز سماعة بلوتوث رقم {i}"},
+            headers={"Cookie": f"{cookie_name}={cookies[user_id]}"},
+            timeout=60
+        )
+        return response.status_code
+
+    return drive(send, args.requests, args.concurrency)
+
+def main():
+    """Run the selected scenarios and print JSON results"""
+    args = parse_args()
+    stub = TelegramStub(latency=args.telegram_latency)
+    configure_environment(args, stub.start())
+
+    import models
+    import services.gemini
+    fake = FakeGeminiClient(args.gemini_latency, args.gemini_jitter, args.output_tokens, args.gemini_error_rate)
+    models.CLIENT = services.gemini.CLIENT = fake
+
+    from werkzeug.serving import make_server
+    from app import app
+    from config import Config
+
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="bench_app", daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    results = {
+        "settings": {
+            "gemini_latency_seconds": args.gemini_latency,
+            "gemini_jitter_seconds": args.gemini_jitter,
+            "gemini_error_rate": args.gemini_error_rate,
+            "output_tokens": args.output_tokens,
+            "telegram_latency_seconds": args.telegram_latency,
+            "users": args.users,
+            "database": "postgresql" if args.database_url else "in-memory",
+            "max_workers": Config.MAX_WORKERS,
+            "dispatch_workers": Config.DISPATCH_WORKERS,
+            "telegram_global_rate": Config.TELEGRAM_GLOBAL_RATE,
+            "telegram_per_chat_rate": Config.TELEGRAM_PER_CHAT_RATE,
+            "web_concurrency": Config.WEB_CONCURRENCY
+        },
+        "scenarios": {}
+    }
+    try:
+        if args.scenario in ("all", "telegram"):
+            results["scenarios"]["telegram"] = run_telegram(args, base_url, stub)
+        if args.scenario in ("all", "web"):
+            results["scenarios"]["web"] = run_web(args, base_url, app)
+        results["gemini_calls"] = fake.models.calls
+        results["telegram_stub_calls"] = stub.calls
+    finally:
+        server.shutdown()
+        stub.stop()
+
+    text = json.dumps(results, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Offline stand-ins for Gemini and the Telegram Bot API used by the benchmarks
+"""
+import json
+import time
+import random
+import threading
+from collections import deque
+from types import SimpleNamespace
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+class FakeModels:
+    """The subset of client.models used by services/gemini.py"""
+
+    def __init__(self, latency, jitter, output_tokens, error_rate):
+        self.latency = latency
+        self.jitter = jitter
+        self.output_tokens = output_tokens
+        self.error_rate = error_rate
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, model, contents, config=None):
+        with self._lock:
+            self.calls += 1
+        time.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+        if self.error_rate and random.random() < self.error_rate:
+            raise RuntimeError("fake Gemini error")
+
+        prompt = contents if isinstance(contents, str) else str(contents[0])
+        return SimpleNamespace(
+            text=" ".join(["تمام"] * self.output_tokens),
+            usage_metadata=SimpleNamespace(
+                prompt_token_count=len(prompt) // 4,
+                candidates_token_count=self.output_tokens,
+                thoughts_token_count=0,
+                cached_content_token_count=0
+            )
+        )
+
+    def list(self, config=None):
+        return iter([SimpleNamespace(name="models/fake")])
+
+class FakeGeminiClient:
+    """Drop-in for models.CLIENT with configurable latency and output size"""
+
+    def __init__(self, latency=0.5, jitter=0.1, output_tokens=150, error_rate=0.0):
+        self.models = FakeModels(latency, jitter, output_tokens, error_rate)
+
+class TelegramStub:
+    """Local Bot API server that accepts every call and records sendMessage arrivals
+
+    Reply latency per chat is measured from expect(chat_id) to the matching
+    sendMessage, oldest expectation first.
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = {}
+        self.reply_latencies = []
+        self._expected = {}
+        self._lock = threading.Lock()
+        self._server = None
+
+    def expect(self, chat_id):
+        """Note that a reply to chat_id is due, starting the clock"""
+        with self._lock:
+            self._expected.setdefault(chat_id, deque()).append(time.perf_counter())
+
+    def cancel(self, chat_id):
+        """Withdraw the newest expectation for chat_id (the app answered inline)"""
+        with self._lock:
+            queue = self._expected.get(chat_id)
+            if queue:
+                queue.pop()
+
+    def pending(self):
+        with self._lock:
+            return sum(len(queue) for queue in self._expected.values())
+
+    def _record(self, method, params):
+        now = time.perf_counter()
+        with self._lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+            if method == "sendMessage":
+                queue = self._expected.get(params.get("chat_id"))
+                if queue:
+                    self.reply_latencies.append(now - queue.popleft())
+
+    def start(self):
+        """Serve on a free localhost port; returns the base URL for TELEGRAM_API_URL"""
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, result):
+                body = json.dumps({"ok": True, "result": result}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                self._handle({})
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                self._handle(json.loads(self.rfile.read(length) or b"{}"))
+
+            def _handle(self, params):
+                method = self.path.split("/")[2].split("?")[0] if self.path.count("/") >= 2 else ""
+                if stub.latency:
+                    time.sleep(stub.latency)
+                stub._record(method, params)
+                if method == "sendMessage":
+                    return self._reply({"message_id": 1, "chat": {"id": params.get("chat_id")}, "text": params.get("text")})
+                if method == "getWebhookInfo":
+                    return self._reply({"url": "", "pending_update_count": 0})
+                if method == "getUpdates":
+                    return self._reply([])
+                return self._reply(True)
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="telegram_stub", daemon=True).start()
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
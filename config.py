@@ -11,15 +11,80 @@ class Config:
     TELEGRAM_DATABASE_URL = os.getenv("TELEGRAM_DATABASE_URL")
     WEB_DATABASE_URL = os.getenv("WEB_DATABASE_URL")
     AUTH_DATABASE_URL = os.getenv("AUTH_DATABASE_URL")
+    TELEGRAM_DB_POOL_MIN = int(os.getenv("TELEGRAM_DB_POOL_MIN", 1))
+    TELEGRAM_DB_POOL_MAX = int(os.getenv("TELEGRAM_DB_POOL_MAX", 5))
+    WEB_DB_POOL_MIN = int(os.getenv("WEB_DB_POOL_MIN", 1))
+    WEB_DB_POOL_MAX = int(os.getenv("WEB_DB_POOL_MAX", 5))
+    AUTH_DB_POOL_MIN = int(os.getenv("AUTH_DB_POOL_MIN", 1))
+    AUTH_DB_POOL_MAX = int(os.getenv("AUTH_DB_POOL_MAX", 5))
+    DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 5))
+    DB_POOL_MAX_LIFETIME = int(os.getenv("DB_POOL_MAX_LIFETIME", 1800))
+    DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+    DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", 15000))
     PORT = int(os.getenv("PORT", 5000))
+    WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", 2))
     MAX_HISTORY = int(os.getenv("MAX_HISTORY", 200))
+    HISTORY_LOAD_BATCH_SIZE = int(os.getenv("HISTORY_LOAD_BATCH_SIZE", 500))
+    HISTORY_LOAD_ACTIVE_DAYS = int(os.getenv("HISTORY_LOAD_ACTIVE_DAYS", 0))
     SAVE_INTERVAL = int(os.getenv("SAVE_INTERVAL", 60))
     MAX_WORKERS = int(os.getenv("MAX_WORKERS", 3))
     REQUEST_TIMEOUT = int(os.getenv("REQUEST_TIMEOUT", 30))
     RAILWAY_STATIC_URL = os.getenv("RAILWAY_STATIC_URL", "")
     RAILWAY_PUBLIC_DOMAIN = os.getenv("RAILWAY_PUBLIC_DOMAIN", "")
+    TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org")
+    TELEGRAM_MAX_RETRIES = int(os.getenv("TELEGRAM_MAX_RETRIES", 3))
+    TELEGRAM_MAX_RETRY_AFTER = int(os.getenv("TELEGRAM_MAX_RETRY_AFTER", 30))
+    TELEGRAM_POOL_SIZE = int(os.getenv("TELEGRAM_POOL_SIZE", 10))
+    TELEGRAM_GLOBAL_RATE = float(os.getenv("TELEGRAM_GLOBAL_RATE", 30))
+    TELEGRAM_PER_CHAT_RATE = float(os.getenv("TELEGRAM_PER_CHAT_RATE", 1))
+    DISPATCH_WORKERS = int(os.getenv("DISPATCH_WORKERS", 4))
+    DISPATCH_MAX_ATTEMPTS = int(os.getenv("DISPATCH_MAX_ATTEMPTS", 5))
+    DISPATCH_MAX_PENDING = int(os.getenv("DISPATCH_MAX_PENDING", 1000))
+    WEBHOOK_STATUS_INTERVAL = int(os.getenv("WEBHOOK_STATUS_INTERVAL", 300))
+    TELEGRAM_MODE = os.getenv("TELEGRAM_MODE", "webhook").lower()
+    POLLING_TIMEOUT = int(os.getenv("POLLING_TIMEOUT", 30))
+    POLLING_LIMIT = int(os.getenv("POLLING_LIMIT", 100))
+    POLLING_LOCK_FILE = os.getenv("POLLING_LOCK_FILE", "/tmp/afaq-telegram-poller.lock")
     IMAGE_MAX_SIZE = int(os.getenv("IMAGE_MAX_SIZE", 5 * 1024 * 1024))
+    MEDIA_DOWNLOAD_TIMEOUT = int(os.getenv("MEDIA_DOWNLOAD_TIMEOUT", 20))
+    MEDIA_CACHE_ENTRIES = int(os.getenv("MEDIA_CACHE_ENTRIES", 256))
+    MEDIA_CACHE_BYTES = int(os.getenv("MEDIA_CACHE_BYTES", 64 * 1024 * 1024))
+    MEDIA_CACHE_TTL = int(os.getenv("MEDIA_CACHE_TTL", 24 * 3600))
+    MEDIA_CACHE_DIR = os.getenv("MEDIA_CACHE_DIR", "")
+    MEDIA_DISK_CACHE_BYTES = int(os.getenv("MEDIA_DISK_CACHE_BYTES", 512 * 1024 * 1024))
     MESSAGE_QUEUE_SIZE = int(os.getenv("MESSAGE_QUEUE_SIZE", 100))
+    UPDATE_DEDUP_WINDOW = int(os.getenv("UPDATE_DEDUP_WINDOW", 1000))
+    QUEUE_FULL_POLICY = os.getenv("QUEUE_FULL_POLICY", "busy").lower()
+    HEALTH_CHECK_INTERVAL = int(os.getenv("HEALTH_CHECK_INTERVAL", 30))
+    HEALTH_CHECK_TIMEOUT = float(os.getenv("HEALTH_CHECK_TIMEOUT", 5))
+    PROMETHEUS_CACHE_SECONDS = float(os.getenv("PROMETHEUS_CACHE_SECONDS", 1))
+    METRICS_MULTIPROC_DIR = os.getenv("METRICS_MULTIPROC_DIR", "")
+    METRICS_SHARD_INTERVAL = float(os.getenv("METRICS_SHARD_INTERVAL", 5))
+    METRICS_SHARD_STALE_SECONDS = float(os.getenv("METRICS_SHARD_STALE_SECONDS", 60))
+    TRACE_LOG_SAMPLE_RATE = float(os.getenv("TRACE_LOG_SAMPLE_RATE", 0))
+    TRACE_LOG_SLOW_SECONDS = float(os.getenv("TRACE_LOG_SLOW_SECONDS", 0))
+    SLOW_REQUEST_SECONDS = float(os.getenv("SLOW_REQUEST_SECONDS", 2))
+    SLOW_REQUEST_BUFFER_SIZE = int(os.getenv("SLOW_REQUEST_BUFFER_SIZE", 100))
+    GEMINI_INPUT_PRICE_PER_M = float(os.getenv("GEMINI_INPUT_PRICE_PER_M", 0.30))
+    GEMINI_OUTPUT_PRICE_PER_M = float(os.getenv("GEMINI_OUTPUT_PRICE_PER_M", 2.50))
+    USAGE_WINDOW_HOURS = int(os.getenv("USAGE_WINDOW_HOURS", 24))
+    USAGE_MAX_USERS = int(os.getenv("USAGE_MAX_USERS", 10000))
+    PROFILER_MAX_SECONDS = int(os.getenv("PROFILER_MAX_SECONDS", 60))
+    PROFILER_MAX_HZ = int(os.getenv("PROFILER_MAX_HZ", 200))
+    PROFILER_MAX_DEPTH = int(os.getenv("PROFILER_MAX_DEPTH", 64))
+    TRACEMALLOC_FRAMES = int(os.getenv("TRACEMALLOC_FRAMES", 10))
+    BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+    PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 2))
+    PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", 8))
+    PASSWORD_HASH_TIMEOUT = float(os.getenv("PASSWORD_HASH_TIMEOUT", 10))
+    USER_INFO_CACHE_TTL = int(os.getenv("USER_INFO_CACHE_TTL", 300))
+    USER_INFO_CACHE_SIZE = int(os.getenv("USER_INFO_CACHE_SIZE", 10000))
+    LOGIN_RATE_PER_MINUTE = int(os.getenv("LOGIN_RATE_PER_MINUTE", 10))
+    LOGIN_BURST = int(os.getenv("LOGIN_BURST", 5))
+    LOGIN_FREE_FAILURES = int(os.getenv("LOGIN_FREE_FAILURES", 3))
+    LOGIN_BACKOFF_MAX = int(os.getenv("LOGIN_BACKOFF_MAX", 300))
+    REGISTER_RATE_PER_MINUTE = int(os.getenv("REGISTER_RATE_PER_MINUTE", 5))
+    LAST_LOGIN_FLUSH_INTERVAL = int(os.getenv("LAST_LOGIN_FLUSH_INTERVAL", 30))
     ENABLE_DEBUG = os.getenv("ENABLE_DEBUG", "false").lower() == "true"
     ADMIN_SECRET = os.getenv("ADMIN_SECRET", "change_me_in_production")
     SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
@@ -29,6 +94,8 @@ class Config:
         """Validate required configuration"""
         if not cls.GEMINI_API_KEY:
             raise ValueError("GEMINI_API_KEY not found in environment variables!")
+        if cls.TELEGRAM_MODE not in ("webhook", "polling"):
+            raise ValueError(f"TELEGRAM_MODE must be 'webhook' or 'polling', got '{cls.TELEGRAM_MODE}'")
         logger.info("✅ Configuration validated successfully")
 
     @classmethod
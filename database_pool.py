@@ -0,0 +1,207 @@
+"""
+Shared PostgreSQL connection pool management
+"""
+import time
+import threading
+from psycopg2 import pool
+from config import Config
+from utils.logger import logger
+from utils.metrics import metrics
+from psycopg2.extensions import connection as base_connection
+
+class PooledConnection(base_connection):
+    """Connection that tracks its age and the statements prepared on it"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.created_at = time.time()
+        self.prepared = set()
+
+def _reset_prepared(conn):
+    """Forget prepared statements after a failure left their state unknown"""
+    conn.prepared.clear()
+    try:
+        conn.rollback()
+        with conn.cursor() as cur:
+            cur.execute("DEALLOCATE ALL")
+        conn.rollback()
+    except Exception as e:
+        logger.warning(f"⚠️  Could not deallocate prepared statements: {e}")
+
+def execute_prepared(cur, name, sql, params=()):
+    """Execute a statement that is prepared once per connection
+
+    The first call on a connection sends PREPARE and EXECUTE in a single
+    round trip, later calls only send EXECUTE. `sql` uses $1, $2, ... placeholders.
+    """
+    conn = cur.connection
+    args = f" ({', '.join(['%s'] * len(params))})" if params else ""
+    statement = f"EXECUTE {name}{args}"
+
+    if name not in conn.prepared:
+        prepare = f"PREPARE {name} AS {sql.replace('%', '%%') if params else sql}"
+        statement = f"{prepare};\n{statement}"
+
+    try:
+        cur.execute(statement, params or None)
+    except Exception:
+        _reset_prepared(conn)
+        raise
+    conn.prepared.add(name)
+
+def stream_rows(conn, cursor_name, sql, params=None, batch_size=500):
+    """Yield rows through a named server-side cursor in fetchmany batches"""
+    with conn.cursor(name=cursor_name) as cur:
+        cur.itersize = batch_size
+        cur.execute(sql, params)
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from rows
+
+def active_since_clause(active_within_days):
+    """Build an updated_at filter for bulk loads, or an empty clause for all rows"""
+    if not active_within_days:
+        return "", None
+    return " WHERE updated_at >= CURRENT_TIMESTAMP - %s * INTERVAL '1 day'", (active_within_days,)
+
+class DatabasePool:
+    """Instrumented connection pool with blocking acquire, pre-ping and max lifetime"""
+
+    def __init__(self, name, dsn, minconn=1, maxconn=5, acquire_timeout=5.0,
+                 max_lifetime=1800, pre_ping=True, statement_timeout_ms=0):
+        self.name = name
+        self.maxconn = maxconn
+        self.acquire_timeout = acquire_timeout
+        self.max_lifetime = max_lifetime
+        self.pre_ping = pre_ping
+
+        connect_kwargs = {"connection_factory": PooledConnection}
+        if statement_timeout_ms > 0:
+            connect_kwargs["options"] = f"-c statement_timeout={int(statement_timeout_ms)}"
+
+        self._pool = pool.ThreadedConnectionPool(
+            minconn=minconn,
+            maxconn=maxconn,
+            dsn=dsn,
+            **connect_kwargs
+        )
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+        self._in_use = 0
+        metrics.track_db_pool_size(name, maxconn)
+
+    def _discard(self, conn):
+        """Close a connection and drop it from the pool"""
+        try:
+            self._pool.putconn(conn, close=True)
+        except Exception as e:
+            logger.error(f"Error discarding {self.name} DB connection: {e}")
+
+    def _is_usable(self, conn):
+        """Check lifetime and liveness of a pooled connection"""
+        if conn.closed:
+            return False
+
+        if self.max_lifetime and time.time() - conn.created_at > self.max_lifetime:
+            return False
+
+        if self.pre_ping:
+            try:
+                conn.autocommit = True
+                with conn.cursor() as cur:
+                    cur.execute("SELECT 1")
+                    cur.fetchone()
+                conn.autocommit = False
+            except Exception:
+                metrics.track_db_error(self.name, "stale_connection")
+                return False
+
+        return True
+
+    def getconn(self, timeout=None):
+        """Check out a live connection, waiting up to timeout seconds for a free slot"""
+        timeout = self.acquire_timeout if timeout is None else timeout
+        start = time.time()
+
+        if not self._slots.acquire(timeout=timeout):
+            metrics.track_db_error(self.name, "checkout_timeout")
+            logger.error(f"⏱️ Timed out after {timeout}s waiting for {self.name} DB connection")
+            return None
+
+        try:
+            for _ in range(self.maxconn + 1):
+                conn = self._pool.getconn()
+                if self._is_usable(conn):
+                    break
+                self._discard(conn)
+            else:
+                raise RuntimeError("no usable connection after recycling the pool")
+        except Exception as e:
+            self._slots.release()
+            metrics.track_db_error(self.name, "checkout_failed")
+            logger.error(f"Error getting {self.name} DB connection: {e}")
+            return None
+
+        with self._lock:
+            self._in_use += 1
+            in_use = self._in_use
+        metrics.track_db_checkout(self.name, time.time() - start, in_use)
+        return conn
+
+    def putconn(self, conn):
+        """Return a connection to the pool, closing it if it is broken"""
+        if conn is None:
+            return
+
+        try:
+            if conn.closed:
+                self._discard(conn)
+            else:
+                if conn.autocommit:
+                    conn.autocommit = False
+                self._pool.putconn(conn)
+        except Exception as e:
+            metrics.track_db_error(self.name, "release_failed")
+            logger.error(f"Error releasing {self.name} DB connection: {e}")
+        finally:
+            with self._lock:
+                self._in_use = max(0, self._in_use - 1)
+                in_use = self._in_use
+            metrics.track_db_in_use(self.name, in_use)
+            self._slots.release()
+
+    def stats(self):
+        """Get current pool usage"""
+        with self._lock:
+            in_use = self._in_use
+        return {"in_use": in_use, "max": self.maxconn}
+
+    def closeall(self):
+        """Close every connection in the pool"""
+        self._pool.closeall()
+
+def create_pool(name, dsn, minconn=1, maxconn=5):
+    """Create an instrumented pool for a database, or None if it is not configured"""
+    if not dsn:
+        logger.warning(f"⚠️  No {name} database configured")
+        return None
+
+    try:
+        db_pool = DatabasePool(
+            name,
+            dsn,
+            minconn=minconn,
+            maxconn=maxconn,
+            acquire_timeout=Config.DB_POOL_TIMEOUT,
+            max_lifetime=Config.DB_POOL_MAX_LIFETIME,
+            pre_ping=Config.DB_POOL_PRE_PING,
+            statement_timeout_ms=Config.DB_STATEMENT_TIMEOUT_MS
+        )
+        logger.info(f"✅ {name.capitalize()} database connection pool created (max {maxconn})")
+        return db_pool
+    except Exception as e:
+        metrics.track_db_error(name, "pool_init_failed")
+        logger.error(f"❌ Failed to create {name} database pool: {e}")
+        return None
@@ -3,39 +3,23 @@ Telegram message handlers
 """
 import base64
 import requests
-from config import Config
-from utils.logger import logger
+from utils.logger import logger, set_log_context
 from utils.metrics import metrics
+from utils.tracing import trace, span
+from services.media import fetch_media
+from services.dispatcher import dispatcher
+from services.telegram_api import FileTooLarge
 from services.gemini import gemini_chat
 from handlers.commands import handle_command
 
-def download_telegram_file(file_id, file_type="photo"):
-    """Download a file from Telegram servers"""
+def download_telegram_file(file_id, file_type="photo", file_unique_id=None):
+    """Download a file from Telegram servers (or the media cache)"""
     try:
-        file_info = requests.get(
-            f"https://api.telegram.org/bot{Config.TELEGRAM_TOKEN}/getFile",
-            params={"file_id": file_id},
-            timeout=Config.REQUEST_TIMEOUT
-        ).json()
-
-        if not file_info.get("ok"):
-            logger.error(f"Failed to get {file_type} file info")
-            return None
-
-        file_size = file_info["result"].get("file_size", 0)
-        if file_size > Config.IMAGE_MAX_SIZE:
-            logger.warning(f"⚠️  File too large: {file_size} bytes")
-            return None
-
-        path = file_info["result"]["file_path"]
-        url = f"https://api.telegram.org/file/bot{Config.TELEGRAM_TOKEN}/{path}"
-
-        response = requests.get(url, timeout=Config.REQUEST_TIMEOUT)
-        response.raise_for_status()
-
-        logger.info(f"✅ Downloaded {file_type} ({file_size} bytes)")
-        return response.content
+        return fetch_media(file_id, file_unique_id=file_unique_id, file_type=file_type)
 
+    except FileTooLarge as e:
+        logger.warning(f"⚠️  File too large: {e}")
+        return None
     except requests.Timeout:
         logger.error(f"⏱️ Timeout downloading {file_type}")
         return None
@@ -44,15 +28,9 @@ def download_telegram_file(file_id, file_type="photo"):
         return None
 
 def send_telegram_message(chat_id, text):
-    """Send a message via Telegram bot"""
+    """Queue a message for the rate-limited outbound dispatcher"""
     try:
-        response = requests.post(
-            f"https://api.telegram.org/bot{Config.TELEGRAM_TOKEN}/sendMessage",
-            json={"chat_id": chat_id, "text": text},
-            timeout=Config.REQUEST_TIMEOUT
-        )
-        response.raise_for_status()
-        return True
+        return dispatcher.enqueue(chat_id, text)
     except Exception as e:
         logger.error(f"❌ Error sending Telegram message: {e}")
         return False
@@ -70,8 +48,33 @@ def validate_telegram_update(update):
     
     return all(field in msg for field in required_fields)
 
+INLINE_COMMANDS = {"/start", "/help", "/clear", "/reset", "/stats"}
+
+def get_inline_command(update):
+    """Return the command if the update is a cheap command that needs no LLM call"""
+    if not validate_telegram_update(update):
+        return None
+
+    text = update["message"].get("text", "").strip()
+    return text if text.lower() in INLINE_COMMANDS else None
+
+def build_inline_command_reply(update, command):
+    """Handle a cheap command and build a sendMessage payload for the webhook response"""
+    msg = update["message"]
+    user_key = f"telegram:{msg['from']['id']}"
+    reply = handle_command(command, user_key)
+    metrics.track_message("inline_command")
+    metrics.track_message("sent")
+    return {"method": "sendMessage", "chat_id": msg["chat"]["id"], "text": reply}
+
 def process_telegram_message(update):
     """Process a Telegram message (runs in background thread)"""
+    update_id = update.get("update_id") if isinstance(update, dict) else None
+    with trace("telegram", update_id=update_id):
+        _process_update(update)
+
+def _process_update(update):
+    """Route an update by content type and queue the reply"""
     try:
         if not validate_telegram_update(update):
             logger.warning("⚠️  Invalid Telegram update received")
@@ -81,6 +84,7 @@ def process_telegram_message(update):
         chat_id = msg["chat"]["id"]
         user_id = str(msg["from"]["id"])
         user_key = f"telegram:{user_id}"
+        set_log_context(user_key=user_key)
         
         reply = None
 
@@ -88,31 +92,37 @@ def process_telegram_message(update):
             text = msg["text"].strip()
 
             if text.startswith("/"):
-                reply = handle_command(text, user_key)
+                with span("telegram.command"):
+                    reply = handle_command(text, user_key)
             else:
                 logger.info(f"📝 Processing text from {user_key}")
-                reply = gemini_chat(text, user_key=user_key)
+                with span("telegram.gemini"):
+                    reply = gemini_chat(text, user_key=user_key)
 
         elif "photo" in msg:
             logger.info(f"🖼️  Processing photo from {user_key}")
-            file_id = msg["photo"][-1]["file_id"]
-            img_data = download_telegram_file(file_id, "photo")
+            photo = msg["photo"][-1]
+            with span("telegram.download"):
+                img_data = download_telegram_file(photo["file_id"], "photo", photo.get("file_unique_id"))
             
             if img_data:
-                b64 = base64.b64encode(img_data).decode()
-                reply = gemini_chat("بعت صورة", image_b64=b64, user_key=user_key)
+                with span("telegram.encode"):
+                    b64 = base64.b64encode(img_data).decode()
+                with span("telegram.gemini"):
+                    reply = gemini_chat("بعت صورة", image_b64=b64, user_key=user_key)
             else:
                 reply = "مش قادر أشوف الصورة دلوقتي، ممكن تبعتها تاني؟"
 
         elif "voice" in msg or "audio" in msg:
             logger.info(f"🎤 Processing audio from {user_key}")
             voice = msg.get("voice") or msg.get("audio")
-            file_id = voice["file_id"]
-            audio_bytes = download_telegram_file(file_id, "audio")
+            with span("telegram.download"):
+                audio_bytes = download_telegram_file(voice["file_id"], "audio", voice.get("file_unique_id"))
 
             if audio_bytes:
                 try:
-                    reply = gemini_chat("بعت صوت", audio_data=audio_bytes, user_key=user_key)
+                    with span("telegram.gemini"):
+                        reply = gemini_chat("بعت صوت", audio_data=audio_bytes, user_key=user_key)
                 except Exception as e:
                     logger.error(f"❌ Error processing audio: {e}")
                     reply = "الصوت مش واضح، ممكن تبعته تاني؟"
@@ -123,8 +133,8 @@ def process_telegram_message(update):
             reply = "ابعت نص أو صورة أو صوت وأنا هساعدك"
 
         if reply:
-            send_telegram_message(chat_id, reply)
-            metrics.track_message("sent")
+            with span("telegram.enqueue"):
+                send_telegram_message(chat_id, reply)
 
     except Exception as e:
         logger.error(f"❌ Error processing Telegram message: {e}", exc_info=True)
@@ -1,9 +1,15 @@
 """
 Admin routes
 """
+import os
 from config import Config
 from utils.logger import logger
-from flask import jsonify, request, Blueprint
+from flask import jsonify, request, Blueprint, Response
+from utils.profiler import profiler, to_collapsed, ProfilerBusy
+from services.memory import memory_report, take_baseline, diff_against_baseline, stop_tracing, tracemalloc_status
+from services.usage import usage_tracker
+from utils.request_timing import slow_requests
+from services.webhook import register_webhook, refresh_webhook_status, get_webhook_state
 from services.history import cleanup_old_conversations, conversation_history
 
 admin_bp = Blueprint('admin', __name__)
@@ -27,4 +33,121 @@ def admin_cleanup():
 
     except Exception as e:
         logger.error(f"❌ Cleanup error: {e}")
-        return jsonify(error=str(e)), 500
\ No newline at end of file
+        return jsonify(error=str(e)), 500
+
+@admin_bp.route("/admin/webhook", methods=["GET", "POST"])
+def admin_webhook():
+    """Admin endpoint to view (GET) or re-register (POST) the Telegram webhook"""
+    auth_token = request.headers.get("Authorization")
+    secret = Config.ADMIN_SECRET
+    if auth_token != f"Bearer {secret}":
+        return jsonify(error="Unauthorized"), 401
+
+    if request.method == "POST":
+        ok = register_webhook(request.host, force=True)
+        return jsonify({"registered": ok, "webhook": get_webhook_state()}), 200 if ok else 502
+
+    refresh_webhook_status()
+    return jsonify({"webhook": get_webhook_state()}), 200
+
+@admin_bp.route("/admin/usage", methods=["GET"])
+def admin_usage():
+    """Admin endpoint listing the top Gemini token consumers of this worker"""
+    auth_token = request.headers.get("Authorization")
+    secret = Config.ADMIN_SECRET
+    if auth_token != f"Bearer {secret}":
+        return jsonify(error="Unauthorized"), 401
+
+    limit = request.args.get("limit", 20, type=int)
+    hours = request.args.get("hours", Config.USAGE_WINDOW_HOURS, type=int)
+    return jsonify({
+        "worker_pid": os.getpid(),
+        "window_hours": min(hours, Config.USAGE_WINDOW_HOURS),
+        "tracked_users": len(usage_tracker),
+        "top_consumers": usage_tracker.top_consumers(limit=limit, hours=hours)
+    }), 200
+
+@admin_bp.route("/admin/profile", methods=["GET"])
+def admin_profile():
+    """Admin endpoint: sample this worker's thread stacks and return collapsed stacks"""
+    auth_token = request.headers.get("Authorization")
+    secret = Config.ADMIN_SECRET
+    if auth_token != f"Bearer {secret}":
+        return jsonify(error="Unauthorized"), 401
+
+    seconds = min(max(request.args.get("seconds", 10, type=float), 0.1), Config.PROFILER_MAX_SECONDS)
+    rate_hz = min(max(request.args.get("hz", 100, type=int), 1), Config.PROFILER_MAX_HZ)
+    include_idle = request.args.get("idle", "0") == "1"
+
+    try:
+        logger.info(f"🔬 Profiling pid {os.getpid()} for {seconds}s at {rate_hz}Hz")
+        result = profiler.profile(seconds, rate_hz, include_idle=include_idle)
+    except ProfilerBusy as e:
+        return jsonify(error=str(e)), 409
+
+    if request.args.get("format") == "json":
+        stacks = result.pop("stacks")
+        return jsonify({**result, "worker_pid": os.getpid(), "stacks": dict(stacks.most_common())}), 200
+
+    headers = {
+        "X-Worker-Pid": str(os.getpid()),
+        "X-Profile-Samples": str(result["samples"]),
+        "X-Profile-Overhead": str(result["overhead_ratio"])
+    }
+    return Response(to_collapsed(result["stacks"]), mimetype="text/plain", headers=headers)
+
+@admin_bp.route("/admin/memory", methods=["GET"])
+def admin_memory():
+    """Admin endpoint: estimated memory per subsystem of this worker"""
+    auth_token = request.headers.get("Authorization")
+    secret = Config.ADMIN_SECRET
+    if auth_token != f"Bearer {secret}":
+        return jsonify(error="Unauthorized"), 401
+
+    top = request.args.get("top", 10, type=int)
+    return jsonify({"worker_pid": os.getpid(), **memory_report(top)}), 200
+
+@admin_bp.route("/admin/memory/snapshot", methods=["GET", "POST", "DELETE"])
+def admin_memory_snapshot():
+    """Admin endpoint: POST takes a tracemalloc baseline, GET diffs against it, DELETE stops tracing"""
+    auth_token = request.headers.get("Authorization")
+    secret = Config.ADMIN_SECRET
+    if auth_token != f"Bearer {secret}":
+        return jsonify(error="Unauthorized"), 401
+
+    top = request.args.get("top", 20, type=int)
+    if request.method == "POST":
+        sites = take_baseline(top)
+        return jsonify({"worker_pid": os.getpid(), "baseline_top_sites": sites, "tracemalloc": tracemalloc_status()}), 200
+
+    if request.method == "DELETE":
+        stop_tracing()
+        return jsonify({"worker_pid": os.getpid(), "tracemalloc": tracemalloc_status()}), 200
+
+    group_by = request.args.get("group_by", "lineno")
+    if group_by not in ("lineno", "filename", "traceback"):
+        return jsonify(error="group_by must be lineno, filename or traceback"), 400
+    diff = diff_against_baseline(top, group_by)
+    if diff is None:
+        return jsonify(error="No baseline; POST /admin/memory/snapshot first"), 409
+    return jsonify({"worker_pid": os.getpid(), "top_growth": diff, "tracemalloc": tracemalloc_status()}), 200
+
+@admin_bp.route("/admin/slow-requests", methods=["GET", "DELETE"])
+def admin_slow_requests():
+    """Admin endpoint: recent requests slower than SLOW_REQUEST_SECONDS with their stage timings (DELETE clears)"""
+    auth_token = request.headers.get("Authorization")
+    secret = Config.ADMIN_SECRET
+    if auth_token != f"Bearer {secret}":
+        return jsonify(error="Unauthorized"), 401
+
+    if request.method == "DELETE":
+        slow_requests.clear()
+        return jsonify({"worker_pid": os.getpid(), "cleared": True}), 200
+
+    limit = request.args.get("limit", 20, type=int)
+    return jsonify({
+        "worker_pid": os.getpid(),
+        "threshold_seconds": slow_requests.threshold_seconds,
+        "captured_total": slow_requests.captured,
+        "requests": slow_requests.entries(limit)
+    }), 200
@@ -1,83 +1,36 @@
 """
 Health check routes
 """
-from config import Config
 from datetime import datetime
 from flask import jsonify, Blueprint
-from services.products import get_product_count
-from services.history import conversation_history
-from web_database import get_web_db_connection, release_web_db_connection
-from auth_database import get_auth_db_connection, release_auth_db_connection
-from telegram_database import get_telegram_db_connection, release_telegram_db_connection
+from services.health import get_health_snapshot, is_snapshot_fresh, is_prober_alive, run_health_checks
 
 health_bp = Blueprint('health', __name__)
 
 @health_bp.route("/health")
 def health_check():
-    """Health check endpoint for Railway"""
-    health = {
-        "status": "healthy",
-        "timestamp": datetime.now().isoformat(),
-        "databases": {
-            "telegram": "not configured",
-            "web": "not configured",
-            "auth": "not configured"
-        },
-        "products_loaded": get_product_count(),
-        "active_conversations": len(conversation_history),
-        "platform": "Railway"
-    }
+    """Health check endpoint for Railway (serves the cached prober snapshot)"""
+    health = get_health_snapshot() or run_health_checks()
+    health.pop("checked_at", None)
+    health["stale"] = not is_snapshot_fresh()
 
-    if Config.TELEGRAM_DATABASE_URL:
-        conn = get_telegram_db_connection()
-        if conn:
-            try:
-                with conn.cursor() as cur:
-                    cur.execute("SELECT 1")
-                    cur.fetchone()
-                health["databases"]["telegram"] = "connected"
-            except Exception:
-                health["databases"]["telegram"] = "error"
-                health["status"] = "unhealthy"
-            finally:
-                release_telegram_db_connection(conn)
-        else:
-            health["databases"]["telegram"] = "connection_failed"
-            health["status"] = "degraded"
+    # Degraded means only non-critical checks failed; the service still works
+    status_code = 503 if health["status"] == "unhealthy" else 200
+    return jsonify(health), status_code
 
-    if Config.WEB_DATABASE_URL:
-        conn = get_web_db_connection()
-        if conn:
-            try:
-                with conn.cursor() as cur:
-                    cur.execute("SELECT 1")
-                    cur.fetchone()
-                health["databases"]["web"] = "connected"
-            except Exception:
-                health["databases"]["web"] = "error"
-                health["status"] = "unhealthy"
-            finally:
-                release_web_db_connection(conn)
-        else:
-            health["databases"]["web"] = "connection_failed"
-            health["status"] = "degraded"
+@health_bp.route("/health/live")
+def liveness_check():
+    """Liveness probe - the process is up and serving requests"""
+    return jsonify(status="alive", prober_running=is_prober_alive(), timestamp=datetime.now().isoformat()), 200
 
-    if Config.AUTH_DATABASE_URL:
-        conn = get_auth_db_connection()
-        if conn:
-            try:
-                with conn.cursor() as cur:
-                    cur.execute("SELECT 1")
-                    cur.fetchone()
-                health["databases"]["auth"] = "connected"
-            except Exception:
-                health["databases"]["auth"] = "error"
-                health["status"] = "unhealthy"
-            finally:
-                release_auth_db_connection(conn)
-        else:
-            health["databases"]["auth"] = "connection_failed"
-            health["status"] = "degraded"
-    
-    status_code = 200 if health["status"] == "healthy" else 503
-    return jsonify(health), status_code
+@health_bp.route("/health/ready")
+def readiness_check():
+    """Readiness probe - a fresh snapshot exists and no critical dependency is failing"""
+    health = get_health_snapshot()
+    ready = bool(health) and is_snapshot_fresh() and health["status"] != "unhealthy"
+
+    return jsonify(
+        status="ready" if ready else "not_ready",
+        health=health.get("status", "unknown"),
+        timestamp=datetime.now().isoformat()
+    ), 200 if ready else 503
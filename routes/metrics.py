@@ -1,18 +1,73 @@
 """
 Metrics routes
 """
+import time
+import threading
+from config import Config
 from datetime import datetime
 from utils.metrics import metrics
-from flask import jsonify, Blueprint
+from utils.logger import log_stats
+from utils import prometheus
+from utils.metrics_shards import collect_export
+from flask import jsonify, Blueprint, Response
 from services.history import conversation_history
 
 metrics_bp = Blueprint('metrics', __name__)
 
+_exposition_cache = {"text": None, "generated_at": 0.0}
+_exposition_lock = threading.Lock()
+
+metrics.register_gauge("active_conversations", lambda: len(conversation_history))
+metrics.register_gauge("log_queue_depth", lambda: log_stats()["queued"])
+metrics.register_counter("log_records_dropped_total", lambda: log_stats()["dropped"])
+
 @metrics_bp.route("/metrics")
 def get_metrics_endpoint():
     """Metrics endpoint"""
-    stats = metrics.get_stats()
-    stats["active_conversations"] = len(conversation_history)
+    export = collect_export()
+    stats = metrics.get_stats(export)
+    stats["active_conversations"] = export["gauges"].get("active_conversations", {}).get((), 0)
     stats["timestamp"] = datetime.now().isoformat()
 
-    return jsonify(stats)
\ No newline at end of file
+    return jsonify(stats)
+
+@metrics_bp.route("/metrics/prometheus")
+def get_prometheus_metrics():
+    """Metrics in Prometheus text exposition format, regenerated at most every PROMETHEUS_CACHE_SECONDS"""
+    with _exposition_lock:
+        now = time.time()
+        if _exposition_cache["text"] is None or now - _exposition_cache["generated_at"] >= Config.PROMETHEUS_CACHE_SECONDS:
+            _exposition_cache["text"] = prometheus.render(collect_export())
+            _exposition_cache["generated_at"] = now
+        text = _exposition_cache["text"]
+
+    return Response(text, content_type=prometheus.CONTENT_TYPE)
+
+@metrics_bp.route("/metrics/stages")
+def get_stage_metrics():
+    """Per-stage latency breakdown of each pipeline, slowest stages first
+
+    Spans nest, so share_of_total is given for top-level stages only; nested
+    stages name their parent instead and are already counted in its share.
+    """
+    stages = {}
+    for labels, snapshot in collect_export()["histograms"].get("stage_duration_seconds", {}).items():
+        labels = dict(labels)
+        stages.setdefault(labels["pipeline"], {})[(labels["stage"], labels.get("parent", ""))] = snapshot
+
+    breakdown = {}
+    for pipeline, pipeline_stages in stages.items():
+        total = pipeline_stages.get(("total", ""))
+        names = [stage for stage, _ in pipeline_stages]
+        breakdown[pipeline] = {}
+        for (stage, parent), snapshot in sorted(pipeline_stages.items(), key=lambda item: -item[1].sum):
+            top_level = not parent and stage != "total"
+            # A stage recorded under more than one parent keeps one entry per parent
+            key = stage if names.count(stage) == 1 or not parent else f"{parent} > {stage}"
+            breakdown[pipeline][key] = {
+                **metrics.summarize(snapshot),
+                "parent": parent or None,
+                "share_of_total": round(snapshot.sum / total.sum, 3) if top_level and total and total.sum else None
+            }
+
+    return jsonify({"pipelines": breakdown, "timestamp": datetime.now().isoformat()})
@@ -2,15 +2,52 @@
 Web chat routes
 """
 import base64
+from config import Config
 from utils.logger import logger
+from utils.rate_limit import Throttle
 from utils.metrics import metrics
+from utils.passwords import PasswordHasherBusy
 from services.gemini import gemini_chat
 from flask import Blueprint, render_template, request, jsonify, session
-from auth_database import authenticate_user, register_user, get_user_info
+from auth_database import authenticate_user, register_user, get_user_info, invalidate_user_info
 from web_database import load_web_conversation, save_web_conversation, clear_web_conversation
 
 web_chat_bp = Blueprint('web_chat', __name__)
 
+HASHER_BUSY_RETRY_AFTER = 5
+
+login_throttle = Throttle(
+    "login",
+    rate_per_minute=Config.LOGIN_RATE_PER_MINUTE,
+    burst=Config.LOGIN_BURST,
+    free_failures=Config.LOGIN_FREE_FAILURES,
+    backoff_max=Config.LOGIN_BACKOFF_MAX
+)
+register_throttle = Throttle(
+    "register",
+    rate_per_minute=Config.REGISTER_RATE_PER_MINUTE,
+    burst=Config.REGISTER_RATE_PER_MINUTE
+)
+
+def get_client_ip():
+    """Get the client IP as seen by the platform proxy"""
+    forwarded = request.headers.get("X-Forwarded-For")
+    if forwarded:
+        return forwarded.split(",")[-1].strip()
+    return request.remote_addr
+
+def throttled_response(retry_after):
+    """Build a 429 response"""
+    response = jsonify({"success": False, "error": "Too many attempts, please try again later"})
+    response.headers["Retry-After"] = str(retry_after)
+    return response, 429
+
+def busy_response():
+    """Build a 503 response for a saturated password hashing pool"""
+    response = jsonify({"success": False, "error": "Server busy, please try again"})
+    response.headers["Retry-After"] = str(HASHER_BUSY_RETRY_AFTER)
+    return response, 503
+
 @web_chat_bp.route("/chat")
 def chat_page():
     """Main chat interface page"""
@@ -20,6 +57,11 @@ def chat_page():
 def api_register():
     """Register a new user"""
     try:
+        ip_key = f"ip:{get_client_ip()}"
+        retry_after = register_throttle.check(ip_key)
+        if retry_after:
+            return throttled_response(retry_after)
+        
         data = request.get_json()
         username = data.get('username', '').strip()
         email = data.get('email', '').strip()
@@ -31,7 +73,10 @@ def api_register():
         if len(password) < 6:
             return jsonify({"success": False, "error": "Password must be at least 6 characters"}), 400
         
-        user_id, error = register_user(username, email, password)
+        try:
+            user_id, error = register_user(username, email, password)
+        except PasswordHasherBusy:
+            return busy_response()
         
         if error:
             return jsonify({"success": False, "error": error}), 400
@@ -57,11 +102,24 @@ def api_login():
         if not username or not password:
             return jsonify({"success": False, "error": "Username and password required"}), 400
         
-        user_id, error = authenticate_user(username, password)
+        user_key = f"user:{username.lower()}"
+        ip_key = f"ip:{get_client_ip()}"
+        retry_after = login_throttle.check(user_key, ip_key)
+        if retry_after:
+            return throttled_response(retry_after)
+        
+        try:
+            user_id, error = authenticate_user(username, password)
+        except PasswordHasherBusy:
+            return busy_response()
         
         if error:
+            if error == "Invalid username or password":
+                login_throttle.record_failure(user_key, ip_key)
             return jsonify({"success": False, "error": error}), 401
         
+        login_throttle.record_success(user_key)
+        
         session['user_id'] = user_id
         session['username'] = username
         
@@ -75,6 +133,9 @@ def api_login():
 @web_chat_bp.route("/api/auth/logout", methods=["POST"])
 def api_logout():
     """Logout user"""
+    user_id = session.get('user_id')
+    if user_id:
+        invalidate_user_info(user_id)
     session.clear()
     return jsonify({"success": True}), 200
 
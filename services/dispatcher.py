@@ -0,0 +1,206 @@
+"""
+Rate-limited outbound Telegram message dispatcher
+"""
+import time
+import requests
+import threading
+from config import Config
+from collections import deque, OrderedDict
+from utils.logger import logger
+from utils.metrics import metrics
+from utils.rate_limit import TokenBucket
+from utils.tracing import record_stage
+from services.telegram_api import telegram_client, TelegramAPIError
+
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+def split_message(text, limit=TELEGRAM_MESSAGE_LIMIT):
+    """Split text into chunks of at most limit characters, preferring line boundaries"""
+    if len(text) <= limit:
+        return [text]
+
+    chunks = []
+    current = ""
+    for line in text.splitlines(keepends=True):
+        while len(line) > limit:
+            cut = line.rfind(" ", 0, limit)
+            cut = cut if cut > 0 else limit
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(line[:cut])
+            line = line[cut:].lstrip(" ")
+        if len(current) + len(line) > limit:
+            chunks.append(current)
+            current = ""
+        current += line
+    if current:
+        chunks.append(current)
+    return [chunk for chunk in chunks if chunk.strip()]
+
+class OutboundDispatcher:
+    """Queue of outgoing messages delivered in order per chat within Telegram's limits
+
+    Each chat is sent at most per_chat_rate messages per second and all chats
+    together at most global_rate. A chat is only handled by one sender thread
+    at a time, so its chunks arrive in order.
+
+    A chunk is only re-sent when Telegram cannot have received it: on a 429
+    with retry_after, or when the connection could not be opened. After a read
+    timeout or a 5xx Telegram may already have delivered it, so the chunk is
+    dropped rather than risk a duplicate reply.
+    """
+
+    def __init__(self, client, workers=4, global_rate=30.0, per_chat_rate=1.0,
+                 max_attempts=5, max_pending=1000):
+        self.client = client
+        self.workers = workers
+        self.per_chat_interval = 1.0 / per_chat_rate
+        self.max_attempts = max_attempts
+        self.max_pending = max_pending
+        self.global_bucket = TokenBucket(global_rate)
+        self._chats = OrderedDict()
+        self._next_allowed = {}
+        self._in_flight = set()
+        self._pending = 0
+        self._cond = threading.Condition()
+        self._threads = []
+
+    def start(self):
+        """Start the sender threads once per process"""
+        with self._cond:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._worker, name=f"telegram-send-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        logger.info(f"✅ Outbound dispatcher started ({self.workers} senders)")
+
+    def enqueue(self, chat_id, text):
+        """Queue a message for delivery and return immediately"""
+        chunks = split_message(text)
+        with self._cond:
+            if self._pending + len(chunks) > self.max_pending:
+                metrics.track_error("outbound_queue_full")
+                logger.warning(f"⚠️  Outbound queue full, dropping reply to {chat_id}")
+                return False
+            queue = self._chats.setdefault(chat_id, deque())
+            for i, chunk in enumerate(chunks):
+                queue.append({"text": chunk, "attempts": 0, "last": i == len(chunks) - 1, "queued_at": time.monotonic()})
+            self._pending += len(chunks)
+            metrics.set_gauge("outbound_queue_depth", self._pending)
+            self._cond.notify()
+        if not self._threads:
+            self.start()
+        return True
+
+    def _next_ready_chat(self, now):
+        """Pick the next chat allowed to send, or return seconds until one is"""
+        wait = None
+        for chat_id in self._chats:
+            if chat_id in self._in_flight:
+                continue
+            ready_in = self._next_allowed.get(chat_id, 0) - now
+            if ready_in <= 0:
+                self._chats.move_to_end(chat_id)
+                return chat_id, None
+            wait = ready_in if wait is None else min(wait, ready_in)
+        return None, wait
+
+    def _worker(self):
+        """Sender loop"""
+        while True:
+            with self._cond:
+                chat_id, wait = self._next_ready_chat(time.monotonic())
+                while chat_id is None:
+                    self._cond.wait(timeout=wait)
+                    chat_id, wait = self._next_ready_chat(time.monotonic())
+                self._in_flight.add(chat_id)
+                item = self._chats[chat_id][0]
+
+            time.sleep(self.global_bucket.reserve())
+            delay = self._send(chat_id, item)
+
+            with self._cond:
+                queue = self._chats[chat_id]
+                if delay is None or item["attempts"] >= self.max_attempts:
+                    queue.popleft()
+                    self._pending -= 1
+                    metrics.set_gauge("outbound_queue_depth", self._pending)
+                    if delay is not None:
+                        metrics.track_error("outbound_dropped")
+                        logger.error(f"❌ Giving up on message to {chat_id} after {item['attempts']} attempts")
+                self._next_allowed[chat_id] = time.monotonic() + max(self.per_chat_interval, delay or 0)
+                if not queue:
+                    del self._chats[chat_id]
+                self._prune_next_allowed()
+                self._in_flight.discard(chat_id)
+                self._cond.notify_all()
+
+    @staticmethod
+    def _never_sent(error):
+        """Whether a failed send certainly did not reach Telegram (connect-phase failure)"""
+        return isinstance(error, requests.ConnectionError) and not isinstance(error, requests.ReadTimeout)
+
+    def _send(self, chat_id, item):
+        """Send one chunk; returns None when done, or seconds to wait before retrying"""
+        item["attempts"] += 1
+        if item["attempts"] == 1:
+            record_stage("outbound", "queue_wait", time.monotonic() - item["queued_at"])
+        start = time.monotonic()
+        try:
+            self.client.send_message(chat_id, item["text"], retries=0)
+            record_stage("outbound", "send", time.monotonic() - start)
+            if item["last"]:
+                metrics.track_message("sent")
+            return None
+        except TelegramAPIError as e:
+            if e.retry_after is not None:
+                metrics.track_error("telegram_429")
+                return e.retry_after
+            if e.error_code and e.error_code < 500:
+                metrics.track_error("telegram_send")
+                logger.error(f"❌ Error sending Telegram message: {e}")
+                return None
+            error = e.__cause__ or e
+        except Exception as e:
+            error = e
+
+        if self._never_sent(error):
+            logger.warning(f"⚠️ Telegram send to {chat_id} could not connect, will retry: {error}")
+            return min(30, 2 ** item["attempts"])
+        metrics.track_error("telegram_send_uncertain")
+        logger.error(f"❌ Telegram send to {chat_id} failed after it may have been delivered, not re-sending: {error}")
+        return None
+
+    def _prune_next_allowed(self):
+        """Forget per-chat rate state for idle chats (lock must be held)"""
+        if len(self._next_allowed) <= 10000:
+            return
+        now = time.monotonic()
+        for chat_id in [c for c, t in self._next_allowed.items() if t < now and c not in self._chats]:
+            del self._next_allowed[chat_id]
+
+    def pending_texts(self):
+        """Get the text of every queued chunk"""
+        with self._cond:
+            return [item["text"] for queue in self._chats.values() for item in queue]
+
+    def stats(self):
+        """Get queue usage"""
+        with self._cond:
+            return {"pending": self._pending, "chats": len(self._chats), "in_flight": len(self._in_flight)}
+
+# Every gunicorn worker has its own buckets, so Telegram's limits are split
+# between them. With polling only the worker holding the poll lock sends.
+_sending_workers = 1 if Config.TELEGRAM_MODE == "polling" else max(1, Config.WEB_CONCURRENCY)
+
+dispatcher = OutboundDispatcher(
+    telegram_client,
+    workers=Config.DISPATCH_WORKERS,
+    global_rate=Config.TELEGRAM_GLOBAL_RATE / _sending_workers,
+    per_chat_rate=Config.TELEGRAM_PER_CHAT_RATE / _sending_workers,
+    max_attempts=Config.DISPATCH_MAX_ATTEMPTS,
+    max_pending=Config.DISPATCH_MAX_PENDING
+)
@@ -9,19 +9,37 @@ from datetime import datetime
 from google.genai import types
 from utils.logger import logger
 from utils.metrics import metrics
+from utils.tracing import trace, span
+from services.usage import record_gemini_usage
 from web_database import save_web_conversation
 from services.products import build_product_catalog
 from models import CLIENT, GENERATION_CONFIG, SAFETY_SETTINGS
 from services.history import conversation_history, get_conversation_context, add_message
 
+MODEL_NAME = 'gemini-2.5-flash'
+
+def check_gemini_reachable():
+    """Health check: list one model to confirm the Gemini API is reachable"""
+    pager = CLIENT.models.list(config={"page_size": 1})
+    next(iter(pager), None)
+    return "ok", None
+
 def gemini_chat(text="", image_b64=None, audio_data=None, user_key="unknown"):
     """Main chat function with Gemini AI"""
+    channel = "web" if user_key.startswith("web:") else "telegram"
+    with trace(channel, user_key=user_key):
+        return _generate_reply(text, image_b64, audio_data, user_key)
+
+def _generate_reply(text, image_b64, audio_data, user_key):
+    """Build the prompt, call Gemini and store the exchange"""
     start_time = time.time()
     max_retries = 2
     try:
         now = datetime.now().strftime("%Y-%m-%d %H:%M")
-        history_text, recent_messages = get_conversation_context(user_key)
-        products_text = build_product_catalog()
+        with span("gemini.context"):
+            history_text, recent_messages = get_conversation_context(user_key)
+        with span("gemini.catalog"):
+            products_text = build_product_catalog()
         prompt = f"""
 أنت البوت الذكي بتاع آفاق ستورز، بتتكلم عامية مصرية ودودة وطبيعية.
 أنت مساعد شامل بتعرف تتكلم في أي موضوع.
@@ -115,47 +133,51 @@ def gemini_chat(text="", image_b64=None, audio_data=None, user_key="unknown"):
                 config_dict.pop('safety_settings', None)
                 
                 if audio_data:
-                    response = CLIENT.models.generate_content(
-                        model='gemini-2.5-flash',
-                        contents=[
-                            prompt,
-                            {"mime_type": "audio/ogg", "data": audio_data}
-                        ],
-                        config=types.GenerateContentConfig(
-                            **config_dict,
-                            safety_settings=SAFETY_SETTINGS
+                    with span("gemini.call") as call:
+                        response = CLIENT.models.generate_content(
+                            model=MODEL_NAME,
+                            contents=[
+                                prompt,
+                                {"mime_type": "audio/ogg", "data": audio_data}
+                            ],
+                            config=types.GenerateContentConfig(
+                                **config_dict,
+                                safety_settings=SAFETY_SETTINGS
+                            )
                         )
-                    )
                     metrics.track_message("with_audio")
                    
                 elif image_b64:
-                    img = Image.open(io.BytesIO(base64.b64decode(image_b64)))
-                    img_bytes = io.BytesIO()
-                    img.save(img_bytes, format='PNG')
-                    img_bytes.seek(0)
+                    with span("gemini.image_decode"):
+                        img = Image.open(io.BytesIO(base64.b64decode(image_b64)))
+                        img_bytes = io.BytesIO()
+                        img.save(img_bytes, format='PNG')
+                        img_bytes.seek(0)
                    
-                    response = CLIENT.models.generate_content(
-                        model='gemini-2.5-flash',
-                        contents=[
-                            prompt,
-                            {"mime_type": "image/png", "data": img_bytes.read()}
-                        ],
-                        config=types.GenerateContentConfig(
-                            **config_dict,
-                            safety_settings=SAFETY_SETTINGS
+                    with span("gemini.call") as call:
+                        response = CLIENT.models.generate_content(
+                            model=MODEL_NAME,
+                            contents=[
+                                prompt,
+                                {"mime_type": "image/png", "data": img_bytes.read()}
+                            ],
+                            config=types.GenerateContentConfig(
+                                **config_dict,
+                                safety_settings=SAFETY_SETTINGS
+                            )
                         )
-                    )
                     metrics.track_message("with_image")
                    
                 else:
-                    response = CLIENT.models.generate_content(
-                        model='gemini-2.5-flash',
-                        contents=prompt,
-                        config=types.GenerateContentConfig(
-                            **config_dict,
-                            safety_settings=SAFETY_SETTINGS
+                    with span("gemini.call") as call:
+                        response = CLIENT.models.generate_content(
+                            model=MODEL_NAME,
+                            contents=prompt,
+                            config=types.GenerateContentConfig(
+                                **config_dict,
+                                safety_settings=SAFETY_SETTINGS
+                            )
                         )
-                    )
                     metrics.track_message("text_only")
                    
                 break
@@ -167,22 +189,27 @@ def gemini_chat(text="", image_b64=None, audio_data=None, user_key="unknown"):
                 else:
                     raise
        
+        channel = "web" if user_key.startswith("web:") else "telegram"
+        request_type = "audio" if audio_data else "image" if image_b64 else "text"
+        record_gemini_usage(response, user_key, channel, MODEL_NAME, request_type, call.duration)
+
         reply = response.text.strip() if response and hasattr(response, "text") and response.text else "ثواني بس فيه مشكلة دلوقتي..."
         
-        add_message(user_key, "user", text or ("[صورة]" if image_b64 else "[صوت]"), now)
-        add_message(user_key, "assistant", reply, now)
+        with span("gemini.persist"):
+            add_message(user_key, "user", text or ("[صورة]" if image_b64 else "[صوت]"), now)
+            add_message(user_key, "assistant", reply, now)
         
-        if user_key.startswith("web:"):
-            try:
-                user_id = int(user_key.split(":")[1])
-                history = conversation_history.get(user_key, [])
-                save_web_conversation(user_id, history)
-                logger.info(f"💾 Saved web conversation for user {user_id}")
-            except Exception as e:
-                logger.error(f"❌ Error saving web conversation: {e}")
+            if user_key.startswith("web:"):
+                try:
+                    user_id = int(user_key.split(":")[1])
+                    history = conversation_history.get(user_key, [])
+                    save_web_conversation(user_id, history)
+                    logger.info(f"💾 Saved web conversation for user {user_id}")
+                except Exception as e:
+                    logger.error(f"❌ Error saving web conversation: {e}")
         
         response_time = time.time() - start_time
-        metrics.track_response_time(response_time)
+        metrics.track_response_time(response_time, channel=channel, media_type=request_type)
        
         logger.info(f"✅ Response generated for {user_key} in {response_time:.2f}s")
         return reply
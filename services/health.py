@@ -0,0 +1,170 @@
+"""
+Background health prober with a cached snapshot
+"""
+import time
+import threading
+import web_database
+import auth_database
+import telegram_database
+from config import Config
+from datetime import datetime
+from utils.logger import logger
+from services.products import get_product_count
+from services.history import conversation_history
+from concurrent.futures import ThreadPoolExecutor, wait
+
+health_checks = {}
+_health_snapshot = {}
+prober_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="health")
+_prober_thread = None
+
+def register_health_check(name, check, critical=True):
+    """Register a dependency check
+
+    A check returns a (status, detail) tuple where status is one of
+    "ok", "degraded", "error" or "not configured", and may raise on failure.
+    Failing critical checks mark the service unhealthy, others only degrade it.
+    """
+    health_checks[name] = {"check": check, "critical": critical}
+
+def _check_db(db_pool, url):
+    """Run SELECT 1 on a database pool"""
+    if not url:
+        return "not configured", None
+    if db_pool is None:
+        return "error", "pool not initialized"
+
+    conn = db_pool.getconn(timeout=Config.HEALTH_CHECK_TIMEOUT)
+    if not conn:
+        return "error", "connection_failed"
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1")
+            cur.fetchone()
+        return "ok", db_pool.stats()
+    finally:
+        db_pool.putconn(conn)
+
+def check_telegram_db():
+    """Telegram database check"""
+    return _check_db(telegram_database.telegram_db_pool, Config.TELEGRAM_DATABASE_URL)
+
+def check_web_db():
+    """Web database check"""
+    return _check_db(web_database.web_db_pool, Config.WEB_DATABASE_URL)
+
+def check_auth_db():
+    """Auth database check"""
+    return _check_db(auth_database.auth_db_pool, Config.AUTH_DATABASE_URL)
+
+def check_catalog():
+    """Product catalog check"""
+    count = get_product_count()
+    if count == 0:
+        return "error", "no products loaded"
+    return "ok", {"products": count}
+
+def _run_check(check):
+    """Run a single check and time it"""
+    start = time.time()
+    try:
+        status, detail = check()
+    except Exception as e:
+        status, detail = "error", str(e)
+    return {
+        "status": status,
+        "detail": detail,
+        "latency_ms": round((time.time() - start) * 1000, 1)
+    }
+
+def run_health_checks():
+    """Run all registered checks in parallel and store the snapshot"""
+    started = time.time()
+    futures = {
+        name: prober_executor.submit(_run_check, entry["check"])
+        for name, entry in list(health_checks.items())
+    }
+    wait(futures.values(), timeout=Config.HEALTH_CHECK_TIMEOUT)
+
+    checks = {}
+    status = "healthy"
+    for name, future in futures.items():
+        if future.done():
+            result = future.result()
+        else:
+            result = {"status": "timeout", "detail": None, "latency_ms": Config.HEALTH_CHECK_TIMEOUT * 1000}
+        checks[name] = result
+
+        if result["status"] in ("ok", "not configured"):
+            continue
+        if health_checks[name]["critical"] and result["status"] != "degraded":
+            status = "unhealthy"
+        elif status == "healthy":
+            status = "degraded"
+
+    snapshot = {
+        "status": status,
+        "timestamp": datetime.now().isoformat(),
+        "checked_at": time.time(),
+        "duration_ms": round((time.time() - started) * 1000, 1),
+        "checks": checks,
+        "databases": {
+            db: _database_status(checks.get(f"{db}_db"))
+            for db in ("telegram", "web", "auth")
+        },
+        "products_loaded": get_product_count(),
+        "active_conversations": len(conversation_history),
+        "platform": "Railway"
+    }
+    global _health_snapshot
+    # Store a copy: callers such as /health edit the dict they get back
+    _health_snapshot = dict(snapshot)
+    return snapshot
+
+def _database_status(result):
+    """Map a database check result to the legacy /health wording"""
+    if not result:
+        return "not configured"
+    return {
+        "ok": "connected",
+        "not configured": "not configured",
+        "timeout": "connection_failed"
+    }.get(result["status"], "error")
+
+def get_health_snapshot():
+    """Get the latest health snapshot"""
+    return dict(_health_snapshot)
+
+def is_snapshot_fresh():
+    """Check that the prober has produced a snapshot recently"""
+    checked_at = _health_snapshot.get("checked_at")
+    if checked_at is None:
+        return False
+    return time.time() - checked_at < Config.HEALTH_CHECK_INTERVAL * 3
+
+def health_prober_loop():
+    """Background task to refresh the health snapshot"""
+    while True:
+        try:
+            run_health_checks()
+        except Exception as e:
+            logger.error(f"❌ Error in health prober: {e}")
+        time.sleep(Config.HEALTH_CHECK_INTERVAL)
+
+def start_health_prober():
+    """Start the background health prober once per process"""
+    global _prober_thread
+    if _prober_thread and _prober_thread.is_alive():
+        return
+    _prober_thread = threading.Thread(target=health_prober_loop, daemon=True)
+    _prober_thread.start()
+    logger.info("✅ Background health prober started")
+
+def is_prober_alive():
+    """Check whether the background prober thread is running"""
+    return bool(_prober_thread and _prober_thread.is_alive())
+
+register_health_check("telegram_db", check_telegram_db)
+register_health_check("web_db", check_web_db)
+register_health_check("auth_db", check_auth_db)
+register_health_check("catalog", check_catalog, critical=False)
@@ -0,0 +1,135 @@
+"""
+Bounded Telegram update intake with update_id de-duplication
+"""
+import threading
+from config import Config
+from utils.logger import logger
+from utils.metrics import metrics
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+ACCEPTED = "accepted"
+DUPLICATE = "duplicate"
+SHED = "shed"
+
+BUSY_REPLY = "معلش فيه ضغط كبير دلوقتي، ابعتلي تاني بعد شوية"
+
+class UpdateIntake:
+    """Bounded queue in front of the Telegram worker pool
+
+    At most max_workers updates run and queue_size wait; anything beyond
+    that is shed. Recently seen update_ids are remembered so Telegram
+    re-deliveries are processed only once.
+    """
+
+    def __init__(self, handler, max_workers, queue_size, dedup_window=1000, policy="busy"):
+        self.handler = handler
+        self.max_workers = max_workers
+        self.queue_size = queue_size
+        self.dedup_window = dedup_window
+        self.policy = policy
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="telegram")
+        self._slots = threading.BoundedSemaphore(max_workers + queue_size)
+        self._lock = threading.Lock()
+        self._capacity = threading.Condition(self._lock)
+        self._recent = OrderedDict()
+        self._queued = 0
+        self._running = 0
+
+    def is_duplicate(self, update):
+        """Remember an update's update_id and report whether it was already seen"""
+        update_id = update.get("update_id") if isinstance(update, dict) else None
+        if update_id is None:
+            return False
+        with self._lock:
+            if update_id in self._recent:
+                return True
+            self._recent[update_id] = True
+            while len(self._recent) > self.dedup_window:
+                self._recent.popitem(last=False)
+        return False
+
+    def _publish_depth(self):
+        """Export queue depth gauges"""
+        metrics.set_gauge("intake_queue_depth", self._queued)
+        metrics.set_gauge("intake_in_flight", self._running)
+
+    def submit(self, update):
+        """Queue an update for processing; returns ACCEPTED, DUPLICATE or SHED"""
+        update_id = update.get("update_id") if isinstance(update, dict) else None
+        if self.is_duplicate(update):
+            metrics.track_intake("duplicate")
+            return DUPLICATE
+
+        if not self._slots.acquire(blocking=False):
+            metrics.track_intake(f"shed_{self.policy}")
+            logger.warning(f"⚠️  Intake queue full, shedding update {update_id} ({self.policy})")
+            return SHED
+
+        with self._lock:
+            self._queued += 1
+        self._publish_depth()
+        try:
+            self.executor.submit(self._run, update)
+        except Exception:
+            with self._lock:
+                self._queued -= 1
+                self._capacity.notify_all()
+            self._slots.release()
+            raise
+        metrics.track_intake("accepted")
+        return ACCEPTED
+
+    def _run(self, update):
+        """Process an update on a worker thread"""
+        with self._lock:
+            self._queued -= 1
+            self._running += 1
+        self._publish_depth()
+        try:
+            self.handler(update)
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._capacity.notify_all()
+            self._publish_depth()
+            self._slots.release()
+
+    def _free_slots(self):
+        """Updates that can still be accepted (lock must be held)"""
+        return self.max_workers + self.queue_size - self._queued - self._running
+
+    def wait_for_capacity(self, timeout=None):
+        """Block until an update can be accepted; returns the number of free slots"""
+        with self._capacity:
+            self._capacity.wait_for(lambda: self._free_slots() > 0, timeout)
+            return self._free_slots()
+
+    def stats(self):
+        """Get current queue usage"""
+        with self._lock:
+            return {
+                "queued": self._queued,
+                "running": self._running,
+                "queue_size": self.queue_size,
+                "max_workers": self.max_workers
+            }
+
+    def busy_reply(self, update):
+        """Build an inline sendMessage reply for a shed update, if the policy wants one"""
+        if self.policy != "busy":
+            return None
+        chat = (update.get("message") or {}).get("chat") if isinstance(update, dict) else None
+        if not chat or "id" not in chat:
+            return None
+        return {"method": "sendMessage", "chat_id": chat["id"], "text": BUSY_REPLY}
+
+def create_intake(handler):
+    """Create the intake using the configured sizes and shedding policy"""
+    return UpdateIntake(
+        handler,
+        max_workers=Config.MAX_WORKERS,
+        queue_size=Config.MESSAGE_QUEUE_SIZE,
+        dedup_window=Config.UPDATE_DEDUP_WINDOW,
+        policy=Config.QUEUE_FULL_POLICY
+    )
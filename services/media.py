@@ -0,0 +1,109 @@
+"""
+Telegram media fetching with memory and disk caches
+"""
+import os
+import re
+import time
+from config import Config
+from utils.cache import TTLCache
+from utils.logger import logger
+from utils.metrics import metrics
+from services.telegram_api import telegram_client, FileTooLarge
+
+media_cache = TTLCache(
+    "media",
+    maxsize=Config.MEDIA_CACHE_ENTRIES,
+    ttl=Config.MEDIA_CACHE_TTL,
+    max_bytes=Config.MEDIA_CACHE_BYTES
+)
+
+def _disk_path(file_unique_id):
+    """Path of a cached file on disk"""
+    safe_id = re.sub(r"[^A-Za-z0-9_-]", "_", file_unique_id)
+    return os.path.join(Config.MEDIA_CACHE_DIR, safe_id)
+
+def _read_disk(file_unique_id):
+    """Read a file from the disk cache, refreshing its LRU timestamp"""
+    if not Config.MEDIA_CACHE_DIR:
+        return None
+    path = _disk_path(file_unique_id)
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+        os.utime(path)
+        metrics.track_cache("media_disk", "hits")
+        return data
+    except FileNotFoundError:
+        metrics.track_cache("media_disk", "misses")
+        return None
+    except OSError as e:
+        logger.warning(f"⚠️  Media disk cache read failed: {e}")
+        return None
+
+def _write_disk(file_unique_id, data):
+    """Write a file to the disk cache and prune the oldest files over budget"""
+    if not Config.MEDIA_CACHE_DIR:
+        return
+    try:
+        os.makedirs(Config.MEDIA_CACHE_DIR, exist_ok=True)
+        path = _disk_path(file_unique_id)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        _prune_disk()
+    except OSError as e:
+        logger.warning(f"⚠️  Media disk cache write failed: {e}")
+
+def _prune_disk():
+    """Delete least recently used files until the disk cache fits its budget"""
+    entries = []
+    total = 0
+    with os.scandir(Config.MEDIA_CACHE_DIR) as it:
+        for entry in it:
+            if entry.is_file() and not entry.name.endswith(".tmp"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+    for _, size, path in sorted(entries):
+        if total <= Config.MEDIA_DISK_CACHE_BYTES:
+            break
+        try:
+            os.remove(path)
+            total -= size
+            metrics.track_cache("media_disk", "evictions")
+        except OSError:
+            continue
+
+def fetch_media(file_id, file_unique_id=None, file_type="photo"):
+    """Get media bytes, from cache when possible, otherwise by a capped streaming download"""
+    if file_unique_id:
+        data = media_cache.get(file_unique_id)
+        if data is None:
+            data = _read_disk(file_unique_id)
+            if data is not None:
+                media_cache.set(file_unique_id, data)
+        if data is not None:
+            logger.info(f"♻️  Using cached {file_type} ({len(data)} bytes)")
+            return data
+
+    file_info = telegram_client.get_file(file_id)
+
+    file_size = file_info.get("file_size", 0)
+    if file_size > Config.IMAGE_MAX_SIZE:
+        raise FileTooLarge(f"{file_type} is {file_size} bytes (limit {Config.IMAGE_MAX_SIZE})")
+
+    start = time.time()
+    data = telegram_client.download_file(
+        file_info["file_path"],
+        max_bytes=Config.IMAGE_MAX_SIZE,
+        timeout=Config.MEDIA_DOWNLOAD_TIMEOUT
+    )
+    logger.info(f"✅ Downloaded {file_type} ({len(data)} bytes in {time.time() - start:.2f}s)")
+
+    file_unique_id = file_unique_id or file_info.get("file_unique_id")
+    if file_unique_id:
+        media_cache.set(file_unique_id, data)
+        _write_disk(file_unique_id, data)
+    return data
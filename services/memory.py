@@ -0,0 +1,167 @@
+"""
+Memory accounting per subsystem and tracemalloc snapshots
+"""
+import gc
+import sys
+import resource
+import threading
+import tracemalloc
+from config import Config
+from utils.logger import logger
+from auth_database import user_info_cache
+from services.media import media_cache
+from services.usage import usage_tracker
+from services.dispatcher import dispatcher
+from services.history import conversation_history
+from services.products import load_products, build_product_catalog
+
+_snapshot_lock = threading.Lock()
+_baseline = None
+
+def deep_sizeof(obj, max_depth=8):
+    """Estimate the bytes held by a container tree of dicts, lists, tuples, sets and scalars"""
+    seen = set()
+    size = 0
+    stack = [(obj, 0)]
+    while stack:
+        item, depth = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        size += sys.getsizeof(item)
+        if depth >= max_depth:
+            continue
+        if isinstance(item, dict):
+            for key, value in list(item.items()):
+                stack.append((key, depth + 1))
+                stack.append((value, depth + 1))
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend((child, depth + 1) for child in list(item))
+    return size
+
+def process_rss_bytes():
+    """Current resident set size from /proc, or peak RSS where /proc is unavailable"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def history_usage(top=10):
+    """Bytes held by conversation_history, in total and for the largest users"""
+    per_user = []
+    messages = 0
+    for user_key, history in list(conversation_history.items()):
+        messages += len(history)
+        per_user.append((deep_sizeof(history), user_key, len(history)))
+    per_user.sort(reverse=True)
+    return {
+        "bytes": sum(size for size, _, _ in per_user) + sys.getsizeof(conversation_history),
+        "users": len(per_user),
+        "messages": messages,
+        "top_users": [{"user_key": user_key, "bytes": size, "messages": count} for size, user_key, count in per_user[:top]]
+    }
+
+def catalog_usage():
+    """Bytes held by the products DataFrame and the size of one rendered catalog prompt"""
+    df = load_products()
+    return {
+        "dataframe_bytes": int(df.memory_usage(deep=True).sum()),
+        "rows": len(df),
+        "prompt_text_bytes": sys.getsizeof(build_product_catalog())
+    }
+
+def cache_usage():
+    """Entries and estimated bytes of the in-process caches"""
+    caches = {}
+    for cache in (user_info_cache, media_cache):
+        values = cache.values()
+        caches[cache.name] = {
+            "entries": len(values),
+            "bytes": cache.total_bytes if cache.max_bytes else deep_sizeof(values),
+            "max_bytes": cache.max_bytes
+        }
+    caches["gemini_usage"] = {"entries": len(usage_tracker), "bytes": deep_sizeof(usage_tracker.entries())}
+    return caches
+
+def queue_usage():
+    """Messages waiting in the outbound dispatcher"""
+    queued = dispatcher.pending_texts()
+    return {"outbound_messages": len(queued), "outbound_bytes": deep_sizeof(queued)}
+
+def memory_report(top=10):
+    """Estimated memory per subsystem plus process-level figures"""
+    report = {"rss_bytes": process_rss_bytes(), "gc_objects": len(gc.get_objects()), "gc_counts": gc.get_count()}
+    for name, reporter in (("history", lambda: history_usage(top)), ("catalog", catalog_usage),
+                           ("caches", cache_usage), ("queues", queue_usage)):
+        try:
+            report[name] = reporter()
+        except Exception as e:
+            logger.error(f"❌ Error measuring {name} memory: {e}")
+            report[name] = {"error": str(e)}
+    report["tracemalloc"] = tracemalloc_status()
+    return report
+
+def _filtered(snapshot):
+    """Drop tracemalloc's own and import machinery frames from a snapshot"""
+    return snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>")
+    ))
+
+def _format_stats(stats, top):
+    return [
+        {
+            "site": str(stat.traceback[0]) if stat.traceback else "?",
+            "size_bytes": stat.size,
+            "size_diff_bytes": getattr(stat, "size_diff", None),
+            "count": stat.count,
+            "count_diff": getattr(stat, "count_diff", None),
+            "traceback": [str(frame) for frame in stat.traceback] if len(stat.traceback) > 1 else None
+        }
+        for stat in stats[:top]
+    ]
+
+def tracemalloc_status():
+    """Whether tracing is on and how much memory it has seen"""
+    if not tracemalloc.is_tracing():
+        return {"tracing": False}
+    current, peak = tracemalloc.get_traced_memory()
+    return {
+        "tracing": True,
+        "traced_bytes": current,
+        "peak_traced_bytes": peak,
+        "overhead_bytes": tracemalloc.get_tracemalloc_memory(),
+        "has_baseline": _baseline is not None
+    }
+
+def take_baseline(top=20):
+    """Start tracemalloc if needed and store a baseline snapshot; returns its top allocation sites"""
+    global _baseline
+    with _snapshot_lock:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(Config.TRACEMALLOC_FRAMES)
+            logger.info(f"🔍 tracemalloc started ({Config.TRACEMALLOC_FRAMES} frames)")
+        _baseline = _filtered(tracemalloc.take_snapshot())
+        return _format_stats(_baseline.statistics("lineno"), top)
+
+def diff_against_baseline(top=20, group_by="lineno"):
+    """Compare a new snapshot with the baseline; returns the biggest growth first"""
+    with _snapshot_lock:
+        if _baseline is None:
+            return None
+        snapshot = _filtered(tracemalloc.take_snapshot())
+        return _format_stats(snapshot.compare_to(_baseline, group_by), top)
+
+def stop_tracing():
+    """Stop tracemalloc and drop the baseline to release its overhead"""
+    global _baseline
+    with _snapshot_lock:
+        _baseline = None
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+            logger.info("🔍 tracemalloc stopped")
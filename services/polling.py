@@ -0,0 +1,139 @@
+"""
+Telegram long-polling (getUpdates) ingestion, an alternative to the webhook
+"""
+import os
+import time
+import fcntl
+import threading
+from config import Config
+from utils.logger import logger
+from utils.metrics import metrics
+from services.telegram_api import telegram_client, TelegramAPIError
+
+class UpdatePoller:
+    """Fetch updates with getUpdates and hand each one to the same pipeline as the webhook
+
+    The offset is advanced past every update in a batch once it has been
+    handed off, so Telegram drops them from its queue on the next call.
+    When capacity is given, each batch is capped to the free intake slots
+    (waiting for one if none is free), so no update is acknowledged and then
+    shed; the rest stay queued at Telegram.
+    Telegram allows one getUpdates caller per bot, so when several workers
+    share a host only the one holding lock_path polls; the rest stand by.
+    """
+
+    def __init__(self, client, handler, reply, poll_timeout=30, limit=100, max_backoff=30, lock_path=None, capacity=None):
+        self.client = client
+        self.handler = handler
+        self.reply = reply
+        self.capacity = capacity
+        self.poll_timeout = poll_timeout
+        self.limit = limit
+        self.max_backoff = max_backoff
+        self.lock_path = lock_path
+        self._lock_file = None
+        self.offset = None
+        self.failures = 0
+        self.last_poll = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def poll_once(self):
+        """Fetch one batch, dispatch it and return the number of updates"""
+        limit = self.limit
+        if self.capacity:
+            free = self.capacity(1.0)
+            if free <= 0:
+                return 0
+            limit = min(limit, free)
+        updates = self.client.get_updates(offset=self.offset, limit=limit, poll_timeout=self.poll_timeout)
+        self.last_poll = time.time()
+        for update in updates:
+            update_id = update.get("update_id")
+            if update_id is not None:
+                self.offset = max(self.offset or 0, update_id + 1)
+            try:
+                payload = self.handler(update)
+                if payload:
+                    self.reply(payload)
+            except Exception as e:
+                logger.error(f"❌ Error dispatching polled update {update_id}: {e}", exc_info=True)
+                metrics.track_error("polling_dispatch")
+        if updates:
+            metrics.track_intake("polled", len(updates))
+        return len(updates)
+
+    def _acquire_leadership(self):
+        """Take the per-host poller lock; returns False while another worker holds it"""
+        if not self.lock_path:
+            return True
+        lock_file = open(self.lock_path, "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    def run(self):
+        """Polling loop with exponential backoff on errors"""
+        if not self._acquire_leadership():
+            logger.info(f"ℹ️  Another worker is polling (pid {os.getpid()} standing by)")
+            while not self._acquire_leadership():
+                if self._stop.wait(self.max_backoff):
+                    return
+        try:
+            self.client.delete_webhook()
+            logger.info("✅ Webhook removed, long polling enabled")
+        except Exception as e:
+            logger.warning(f"⚠️  Could not remove webhook before polling: {e}")
+
+        while not self._stop.is_set():
+            try:
+                self.poll_once()
+                self.failures = 0
+            except Exception as e:
+                self.failures += 1
+                delay = min(self.max_backoff, 2 ** self.failures)
+                if isinstance(e, TelegramAPIError) and e.error_code == 409:
+                    logger.error(f"❌ getUpdates conflict (another poller or a webhook is active), retrying in {delay}s")
+                else:
+                    logger.error(f"❌ getUpdates failed, retrying in {delay}s: {e}")
+                metrics.track_error("polling")
+                self._stop.wait(delay)
+
+    def start(self):
+        """Start the polling thread once per process"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name="telegram-poller", daemon=True)
+        self._thread.start()
+        logger.info(f"✅ Long polling started (timeout {self.poll_timeout}s, batch {self.limit})")
+
+    def stop(self):
+        """Ask the polling loop to exit after the current request"""
+        self._stop.set()
+
+    def stats(self):
+        """Get polling state"""
+        return {
+            "offset": self.offset,
+            "failures": self.failures,
+            "last_poll": self.last_poll,
+            "alive": bool(self._thread and self._thread.is_alive()),
+            "leader": self._lock_file is not None or not self.lock_path
+        }
+
+def create_poller(handler, reply, capacity=None):
+    """Create a poller using the configured Telegram client and batch settings"""
+    return UpdatePoller(
+        telegram_client,
+        handler,
+        reply,
+        poll_timeout=Config.POLLING_TIMEOUT,
+        limit=Config.POLLING_LIMIT,
+        lock_path=Config.POLLING_LOCK_FILE,
+        capacity=capacity
+    )
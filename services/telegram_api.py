@@ -0,0 +1,150 @@
+"""
+Telegram Bot API client
+"""
+import time
+import requests
+from config import Config
+from utils.logger import logger
+from utils.metrics import metrics
+from requests.adapters import HTTPAdapter
+
+class TelegramAPIError(Exception):
+    """Raised when a Bot API call fails"""
+
+    def __init__(self, method, error_code=None, description="", retry_after=None):
+        super().__init__(f"Telegram {method} failed ({error_code}): {description}")
+        self.method = method
+        self.error_code = error_code
+        self.description = description
+        self.retry_after = retry_after
+
+class FileTooLarge(Exception):
+    """Raised when a download exceeds its byte cap"""
+
+class TelegramClient:
+    """Bot API client on a shared keep-alive session with retries"""
+
+    def __init__(self, token, base_url="https://api.telegram.org", timeout=30,
+                 max_retries=3, backoff=0.5, max_retry_after=30, pool_size=10):
+        self.token = token
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_retry_after = max_retry_after
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _retry_delay(self, attempt, error):
+        """Seconds to wait before retrying, or None if the error is final"""
+        if isinstance(error, TelegramAPIError):
+            if error.retry_after is not None:
+                return error.retry_after if error.retry_after <= self.max_retry_after else None
+            if not error.error_code or error.error_code < 500:
+                return None
+        return self.backoff * (2 ** attempt)
+
+    def call(self, method, http_method="POST", timeout=None, retries=None, fields=None, **params):
+        """Call a Bot API method and return its result
+
+        fields carries parameters whose names clash with call()'s own, such as
+        getUpdates' long-poll timeout.
+        """
+        params = {**(fields or {}), **params}
+        url = f"{self.base_url}/bot{self.token}/{method}"
+        retries = self.max_retries if retries is None else retries
+        for attempt in range(retries + 1):
+            start = time.time()
+            try:
+                if http_method == "GET":
+                    response = self.session.get(url, params=params, timeout=timeout or self.timeout)
+                else:
+                    response = self.session.post(url, json=params, timeout=timeout or self.timeout)
+                payload = response.json()
+                if payload.get("ok"):
+                    return payload.get("result")
+                error = TelegramAPIError(
+                    method,
+                    payload.get("error_code", response.status_code),
+                    payload.get("description", ""),
+                    payload.get("parameters", {}).get("retry_after")
+                )
+            except (requests.ConnectionError, requests.Timeout, ValueError) as e:
+                error = e
+            finally:
+                metrics.track_api_latency("telegram", method, time.time() - start)
+
+            delay = self._retry_delay(attempt, error)
+            if delay is None or attempt == retries:
+                break
+            metrics.track_error(f"telegram_{method}_retry")
+            logger.warning(f"⚠️ Telegram {method} attempt {attempt + 1} failed, retrying in {delay}s: {error}")
+            time.sleep(delay)
+
+        if isinstance(error, TelegramAPIError):
+            raise error
+        raise TelegramAPIError(method, description=str(error)) from error
+
+    def get_file(self, file_id):
+        """Get file metadata (file_path, file_size, file_unique_id)"""
+        return self.call("getFile", http_method="GET", file_id=file_id)
+
+    def download_file(self, file_path, max_bytes=None, timeout=None, chunk_size=64 * 1024):
+        """Stream a file by its Bot API file_path with a byte cap and overall deadline"""
+        url = f"{self.base_url}/file/bot{self.token}/{file_path}"
+        timeout = timeout or self.timeout
+        start = time.time()
+        try:
+            with self.session.get(url, stream=True, timeout=timeout) as response:
+                response.raise_for_status()
+                declared = int(response.headers.get("Content-Length") or 0)
+                if max_bytes and declared > max_bytes:
+                    raise FileTooLarge(f"{file_path} is {declared} bytes (limit {max_bytes})")
+
+                chunks = []
+                total = 0
+                for chunk in response.iter_content(chunk_size=chunk_size):
+                    total += len(chunk)
+                    if max_bytes and total > max_bytes:
+                        raise FileTooLarge(f"{file_path} exceeded {max_bytes} bytes")
+                    if time.time() - start > timeout:
+                        raise requests.Timeout(f"{file_path} download exceeded {timeout}s")
+                    chunks.append(chunk)
+                return b"".join(chunks)
+        finally:
+            metrics.track_api_latency("telegram", "downloadFile", time.time() - start)
+
+    def send_message(self, chat_id, text, **params):
+        """Send a text message"""
+        return self.call("sendMessage", chat_id=chat_id, text=text, **params)
+
+    def set_webhook(self, url):
+        """Register the webhook URL"""
+        return self.call("setWebhook", url=url)
+
+    def get_webhook_info(self):
+        """Get the current webhook status"""
+        return self.call("getWebhookInfo", http_method="GET")
+
+    def delete_webhook(self):
+        """Remove the webhook so getUpdates can be used"""
+        return self.call("deleteWebhook")
+
+    def get_updates(self, offset=None, limit=100, poll_timeout=30):
+        """Long-poll for new updates; the HTTP timeout outlasts the poll"""
+        fields = {"limit": limit, "timeout": poll_timeout, "allowed_updates": ["message"]}
+        if offset is not None:
+            fields["offset"] = offset
+        return self.call("getUpdates", timeout=poll_timeout + 10, retries=0, fields=fields)
+
+telegram_client = TelegramClient(
+    Config.TELEGRAM_TOKEN,
+    base_url=Config.TELEGRAM_API_URL,
+    timeout=Config.REQUEST_TIMEOUT,
+    max_retries=Config.TELEGRAM_MAX_RETRIES,
+    max_retry_after=Config.TELEGRAM_MAX_RETRY_AFTER,
+    pool_size=Config.TELEGRAM_POOL_SIZE
+)
@@ -0,0 +1,115 @@
+"""
+Gemini token usage accounting
+"""
+import time
+import threading
+from config import Config
+from collections import OrderedDict
+from utils.logger import logger
+from utils.metrics import metrics
+from utils.tracing import current_trace
+
+PROMPT_SIZE_BANDS = ((2000, "<2k"), (8000, "2k-8k"), (32000, "8k-32k"))
+
+def prompt_size_band(prompt_tokens):
+    """Coarse prompt size label for correlating tokens with latency"""
+    for limit, label in PROMPT_SIZE_BANDS:
+        if prompt_tokens < limit:
+            return label
+    return ">32k"
+
+def estimate_cost(prompt_tokens, output_tokens):
+    """Estimated USD cost from the configured per-million-token prices"""
+    return (prompt_tokens * Config.GEMINI_INPUT_PRICE_PER_M + output_tokens * Config.GEMINI_OUTPUT_PRICE_PER_M) / 1_000_000
+
+class UsageTracker:
+    """Rolling per-user token totals kept in hourly buckets
+
+    Only the last window_hours are kept per user, and at most max_users
+    users (least recently active are dropped first).
+    """
+
+    def __init__(self, window_hours=24, max_users=10000):
+        self.window_hours = window_hours
+        self.max_users = max_users
+        self._users = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record(self, user_key, channel, prompt_tokens, output_tokens):
+        """Add one call's tokens to the user's current hour"""
+        hour = int(time.time() // 3600)
+        with self._lock:
+            entry = self._users.pop(user_key, None) or {"channel": channel, "hours": {}}
+            self._users[user_key] = entry
+            bucket = entry["hours"].setdefault(hour, [0, 0, 0])
+            bucket[0] += 1
+            bucket[1] += prompt_tokens
+            bucket[2] += output_tokens
+            for old_hour in [h for h in entry["hours"] if h <= hour - self.window_hours]:
+                del entry["hours"][old_hour]
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+
+    def _totals(self, entry, since_hour):
+        calls = prompt = output = 0
+        for hour, (bucket_calls, bucket_prompt, bucket_output) in list(entry["hours"].items()):
+            if hour > since_hour:
+                calls += bucket_calls
+                prompt += bucket_prompt
+                output += bucket_output
+        return {
+            "channel": entry["channel"],
+            "calls": calls,
+            "prompt_tokens": prompt,
+            "output_tokens": output,
+            "total_tokens": prompt + output,
+            "estimated_cost_usd": round(estimate_cost(prompt, output), 6)
+        }
+
+    def top_consumers(self, limit=20, hours=None):
+        """Users with the most tokens over the last hours (default: the whole window)"""
+        hours = min(hours or self.window_hours, self.window_hours)
+        since_hour = int(time.time() // 3600) - hours
+        with self._lock:
+            entries = list(self._users.items())
+        totals = [{"user_key": user_key, **self._totals(entry, since_hour)} for user_key, entry in entries]
+        totals = [t for t in totals if t["calls"]]
+        totals.sort(key=lambda t: t["total_tokens"], reverse=True)
+        return totals[:limit]
+
+    def entries(self):
+        """Get a copy of the per-user hourly buckets"""
+        with self._lock:
+            return {user_key: dict(entry["hours"]) for user_key, entry in self._users.items()}
+
+    def __len__(self):
+        return len(self._users)
+
+usage_tracker = UsageTracker(window_hours=Config.USAGE_WINDOW_HOURS, max_users=Config.USAGE_MAX_USERS)
+
+def record_gemini_usage(response, user_key, channel, model, request_type, call_seconds):
+    """Read usage_metadata from a Gemini response and account for it"""
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        metrics.track_error("gemini_usage_missing")
+        return None
+
+    prompt_tokens = usage.prompt_token_count or 0
+    output_tokens = (usage.candidates_token_count or 0) + (getattr(usage, "thoughts_token_count", None) or 0)
+    cached_tokens = getattr(usage, "cached_content_token_count", None) or 0
+
+    try:
+        metrics.track_tokens(channel, model, request_type, "prompt", prompt_tokens)
+        metrics.track_tokens(channel, model, request_type, "output", output_tokens)
+        if cached_tokens:
+            metrics.track_tokens(channel, model, request_type, "cached", cached_tokens)
+        metrics.observe("gemini_call", call_seconds, request_type=request_type, prompt_size=prompt_size_band(prompt_tokens))
+        usage_tracker.record(user_key, channel, prompt_tokens, output_tokens)
+
+        trace = current_trace()
+        if trace:
+            trace.attributes.update(prompt_tokens=prompt_tokens, output_tokens=output_tokens)
+    except Exception as e:
+        logger.error(f"❌ Error recording Gemini usage: {e}")
+
+    return {"prompt_tokens": prompt_tokens, "output_tokens": output_tokens, "cached_tokens": cached_tokens}
@@ -0,0 +1,99 @@
+"""
+Telegram webhook registration and cached status
+"""
+import time
+import threading
+from config import Config
+from datetime import datetime
+from utils.logger import logger
+from services.telegram_api import telegram_client
+
+webhook_state = {
+    "url": None,
+    "registered": False,
+    "pending_update_count": 0,
+    "last_error": None,
+    "last_checked": None
+}
+_state_lock = threading.Lock()
+_manager_thread = None
+
+def _update_state(**values):
+    """Update the cached webhook state"""
+    with _state_lock:
+        webhook_state.update(values)
+
+def get_webhook_state():
+    """Get a copy of the cached webhook state"""
+    with _state_lock:
+        return dict(webhook_state)
+
+def get_webhook_url(request_host=None):
+    """Build the webhook URL for the configured (or given) domain"""
+    domain = Config.get_webhook_domain(request_host)
+    return f"https://{domain}/telegram" if domain else None
+
+def refresh_webhook_status():
+    """Fetch getWebhookInfo and cache it"""
+    try:
+        info = telegram_client.get_webhook_info()
+        _update_state(
+            pending_update_count=info.get("pending_update_count", 0),
+            last_error=info.get("last_error_message"),
+            last_checked=datetime.now().isoformat(),
+            registered=bool(info.get("url")) and info.get("url") == webhook_state["url"]
+        )
+        return info
+    except Exception as e:
+        logger.error(f"❌ Error fetching webhook info: {e}")
+        _update_state(last_error=str(e), last_checked=datetime.now().isoformat())
+        return None
+
+def register_webhook(request_host=None, force=False):
+    """Register the webhook unless Telegram already points at it"""
+    url = get_webhook_url(request_host)
+    if not url:
+        logger.warning("⚠️  No public domain configured, webhook not registered")
+        return False
+
+    _update_state(url=url)
+    info = refresh_webhook_status()
+    if info and info.get("url") == url and not force:
+        logger.info(f"✅ Webhook already registered: {url}")
+        _update_state(registered=True)
+        return True
+
+    try:
+        telegram_client.set_webhook(url)
+        _update_state(registered=True, last_error=None)
+        logger.info(f"✅ Webhook registered: {url}")
+        return True
+    except Exception as e:
+        logger.error(f"❌ Error setting up webhook: {e}")
+        _update_state(registered=False, last_error=str(e))
+        return False
+
+def ensure_webhook_registered(request_host):
+    """Register in the background using the request host when no domain is configured"""
+    if webhook_state["url"] or not request_host:
+        return
+    _update_state(url=get_webhook_url(request_host))
+    threading.Thread(target=register_webhook, args=(request_host,), daemon=True).start()
+
+def webhook_manager_loop():
+    """Background task: register once, then keep the status snapshot fresh"""
+    register_webhook()
+    while True:
+        time.sleep(Config.WEBHOOK_STATUS_INTERVAL)
+        refresh_webhook_status()
+
+def start_webhook_manager():
+    """Start the webhook manager once per process"""
+    global _manager_thread
+    if not Config.TELEGRAM_TOKEN:
+        return
+    if _manager_thread and _manager_thread.is_alive():
+        return
+    _manager_thread = threading.Thread(target=webhook_manager_loop, daemon=True)
+    _manager_thread.start()
+    logger.info("✅ Webhook manager started")
@@ -1,49 +1,42 @@
 """
 Telegram database connection and operations
 """
-from psycopg2 import pool
 from config import Config
+from database_pool import create_pool, execute_prepared, stream_rows, active_since_clause
 from utils.logger import logger
 from psycopg2.extras import Json
 
 telegram_db_pool = None
 
+UPSERT_TELEGRAM_CONVERSATION_SQL = """
+    INSERT INTO telegram_conversations (user_key, history, updated_at)
+    VALUES ($1, $2, CURRENT_TIMESTAMP)
+    ON CONFLICT (user_key)
+    DO UPDATE SET
+        history = EXCLUDED.history,
+        updated_at = CURRENT_TIMESTAMP
+"""
+
 def init_telegram_db_pool():
     """Initialize Telegram database connection pool"""
     global telegram_db_pool
-    
-    if not Config.TELEGRAM_DATABASE_URL:
-        logger.warning("⚠️  No Telegram database configured")
-        return
-    
-    try:
-        telegram_db_pool = pool.ThreadedConnectionPool(
-            minconn=1,
-            maxconn=5,
-            dsn=Config.TELEGRAM_DATABASE_URL
-        )
-        logger.info("✅ Telegram database connection pool created")
-    except Exception as e:
-        logger.error(f"❌ Failed to create Telegram database pool: {e}")
-        telegram_db_pool = None
+    telegram_db_pool = create_pool(
+        "telegram",
+        Config.TELEGRAM_DATABASE_URL,
+        minconn=Config.TELEGRAM_DB_POOL_MIN,
+        maxconn=Config.TELEGRAM_DB_POOL_MAX
+    )
 
 def get_telegram_db_connection():
     """Get a database connection from the Telegram pool"""
     if telegram_db_pool:
-        try:
-            return telegram_db_pool.getconn()
-        except Exception as e:
-            logger.error(f"Error getting Telegram DB connection: {e}")
-            return None
+        return telegram_db_pool.getconn()
     return None
 
 def release_telegram_db_connection(conn):
     """Release a database connection back to the Telegram pool"""
     if telegram_db_pool and conn:
-        try:
-            telegram_db_pool.putconn(conn)
-        except Exception as e:
-            logger.error(f"Error releasing Telegram DB connection: {e}")
+        telegram_db_pool.putconn(conn)
 
 def init_telegram_database_tables():
     """Initialize Telegram database tables"""
@@ -87,16 +80,14 @@ def save_telegram_conversation_to_db(user_key, history):
         return False
     
     try:
+        conn.autocommit = True
         with conn.cursor() as cur:
-            cur.execute("""
-                INSERT INTO telegram_conversations (user_key, history, updated_at)
-                VALUES (%s, %s, CURRENT_TIMESTAMP)
-                ON CONFLICT (user_key) 
-                DO UPDATE SET 
-                    history = EXCLUDED.history,
-                    updated_at = CURRENT_TIMESTAMP
-            """, (user_key, Json(history)))
-        conn.commit()
+            execute_prepared(
+                cur,
+                "upsert_telegram_conversation",
+                UPSERT_TELEGRAM_CONVERSATION_SQL,
+                (user_key, Json(history))
+            )
         return True
     except Exception as e:
         logger.error(f"Error saving Telegram conversation: {e}")
@@ -105,8 +96,12 @@ def save_telegram_conversation_to_db(user_key, history):
     finally:
         release_telegram_db_connection(conn)
 
-def load_all_telegram_conversations():
-    """Load all Telegram conversations from database"""
+def load_all_telegram_conversations(active_within_days=None, batch_size=None):
+    """Load Telegram conversations from database in server-side cursor batches
+
+    active_within_days limits the load to conversations updated recently
+    (defaults to Config.HISTORY_LOAD_ACTIVE_DAYS, 0 loads everything).
+    """
     if not Config.TELEGRAM_DATABASE_URL:
         return {}
     
@@ -114,16 +109,29 @@ def load_all_telegram_conversations():
     if not conn:
         return {}
     
+    if active_within_days is None:
+        active_within_days = Config.HISTORY_LOAD_ACTIVE_DAYS
+    batch_size = batch_size or Config.HISTORY_LOAD_BATCH_SIZE
+    where, params = active_since_clause(active_within_days)
+    
     conversations = {}
     try:
-        with conn.cursor() as cur:
-            cur.execute("SELECT user_key, history FROM telegram_conversations")
-            rows = cur.fetchall()
-            for user_key, hist in rows:
-                conversations[user_key] = hist
+        rows = stream_rows(
+            conn,
+            "load_telegram_conversations",
+            f"SELECT user_key, history FROM telegram_conversations{where}",
+            params,
+            batch_size
+        )
+        for user_key, hist in rows:
+            conversations[user_key] = hist
+            if len(conversations) % (batch_size * 10) == 0:
+                logger.info(f"⏳ Loaded {len(conversations)} Telegram conversations so far...")
+        conn.commit()
         logger.info(f"✅ Loaded {len(conversations)} Telegram conversations")
     except Exception as e:
         logger.error(f"❌ Error loading Telegram conversations: {e}")
+        conn.rollback()
     finally:
         release_telegram_db_connection(conn)
     
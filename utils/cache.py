@@ -0,0 +1,80 @@
+"""
+In-process caches
+"""
+import time
+import threading
+from collections import OrderedDict
+from utils.metrics import metrics
+
+_MISSING = object()
+
+class TTLCache:
+    """Thread-safe LRU cache with optional per-entry time to live
+
+    When max_bytes is set, entries are also evicted until the summed
+    weigher(value) fits within it.
+    """
+
+    def __init__(self, name, maxsize=1024, ttl=None, max_bytes=None, weigher=len):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.weigher = weigher
+        self.total_bytes = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _pop(self, key):
+        """Remove an entry and release its weight (lock must be held)"""
+        value, _ = self._data.pop(key)
+        if self.max_bytes:
+            self.total_bytes -= self.weigher(value)
+
+    def get(self, key, default=None):
+        """Get a cached value, or default if it is missing or expired"""
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                value, expires_at = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    metrics.track_cache(self.name, "hits")
+                    return value
+                self._pop(key)
+                metrics.track_cache(self.name, "expired")
+        metrics.track_cache(self.name, "misses")
+        return default
+
+    def set(self, key, value):
+        """Store a value, evicting the least recently used entries when full"""
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            if key in self._data:
+                self._pop(key)
+            self._data[key] = (value, expires_at)
+            if self.max_bytes:
+                self.total_bytes += self.weigher(value)
+            while len(self._data) > self.maxsize or (self.max_bytes and self.total_bytes > self.max_bytes):
+                self._pop(next(iter(self._data)))
+                metrics.track_cache(self.name, "evictions")
+
+    def invalidate(self, key):
+        """Drop a single entry"""
+        with self._lock:
+            if key in self._data:
+                self._pop(key)
+
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._data.clear()
+            self.total_bytes = 0
+
+    def values(self):
+        """Get a list of the cached values (expired ones included)"""
+        with self._lock:
+            return [value for value, _ in self._data.values()]
+
+    def __len__(self):
+        return len(self._data)
@@ -0,0 +1,204 @@
+"""
+Thread-safe fixed-bucket histograms and counters for metrics
+"""
+import math
+import threading
+
+class _ThreadShards:
+    """Per-thread storage so every shard has exactly one writer
+
+    Recording only touches the calling thread's shard, which needs no lock and
+    cannot lose increments. Readers combine all shards; shards of threads that
+    have exited are folded into a retired total so they do not pile up.
+    """
+
+    def __init__(self, factory, fold):
+        self._factory = factory
+        self._fold = fold
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards = []
+        self.retired = factory()
+
+    def get(self):
+        """Get the calling thread's shard"""
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._factory()
+            with self._lock:
+                self._shards.append((threading.current_thread(), shard))
+            self._local.shard = shard
+            return shard
+
+    def collect(self):
+        """Get the retired total and the live shards"""
+        with self._lock:
+            live = []
+            for thread, shard in self._shards:
+                if thread.is_alive():
+                    live.append((thread, shard))
+                else:
+                    self._fold(self.retired, shard)
+            self._shards = live
+            return [self.retired] + [shard for _, shard in live]
+
+class ShardedCounter:
+    """Counter keyed by label (a string or tuple) that is safe to bump from any thread"""
+
+    def __init__(self):
+        self._shards = _ThreadShards(dict, self._fold)
+
+    @staticmethod
+    def _fold(into, shard):
+        for key, value in shard.items():
+            into[key] = into.get(key, 0) + value
+
+    def inc(self, key, amount=1):
+        """Add amount to key"""
+        shard = self._shards.get()
+        shard[key] = shard.get(key, 0) + amount
+
+    def values(self):
+        """Get the totals per key"""
+        totals = {}
+        for shard in self._shards.collect():
+            self._fold(totals, shard.copy())
+        return totals
+
+    def total(self):
+        """Get the sum over all keys"""
+        return sum(self.values().values())
+
+class _HistogramShard:
+    """One thread's bucket counts and running totals"""
+    __slots__ = ("counts", "count", "sum", "min", "max")
+
+    def __init__(self, size):
+        self.counts = [0] * size
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+class HistogramSnapshot:
+    """Point-in-time copy of a histogram that can be queried and merged"""
+
+    def __init__(self, upper_bounds, counts, count, total, minimum, maximum):
+        self.upper_bounds = upper_bounds
+        self.counts = counts
+        self.count = count
+        self.sum = total
+        self.min = minimum if count else 0.0
+        self.max = maximum if count else 0.0
+
+    def merge(self, other):
+        """Combine with a snapshot of a histogram with the same buckets"""
+        if not other.count:
+            return self
+        if not self.count:
+            return other
+        return HistogramSnapshot(
+            self.upper_bounds,
+            [a + b for a, b in zip(self.counts, other.counts)],
+            self.count + other.count,
+            self.sum + other.sum,
+            min(self.min, other.min),
+            max(self.max, other.max)
+        )
+
+    @property
+    def mean(self):
+        return self.sum / self.count if self.count else 0.0
+
+    def percentile(self, q):
+        """Estimate the q-th percentile (0-100) from the bucket counts"""
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(self.count * q / 100))
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                lower = self.upper_bounds[i - 1] if i else self.min
+                upper = self.upper_bounds[i]
+                estimate = (lower + upper) / 2 if math.isfinite(upper) else self.max
+                return min(max(estimate, self.min), self.max)
+        return self.max
+
+    def cumulative(self, bounds):
+        """Count of values at or below each of the given bounds (for exposition formats)"""
+        result = []
+        seen = 0
+        i = 0
+        for bound in bounds:
+            while i < len(self.counts) and self.upper_bounds[i] <= bound:
+                seen += self.counts[i]
+                i += 1
+            result.append(seen)
+        return result
+
+class Histogram:
+    """Log-linear histogram: sub_buckets equal-width buckets per power of two
+
+    Recording is O(1) and lock-free. With 8 sub-buckets a bucket spans at most
+    12.5% of its lower bound, so percentile estimates are within about 6%.
+    Values outside [min_value, max_value] land in an underflow/overflow bucket.
+    """
+
+    def __init__(self, sub_buckets=8, min_value=1e-4, max_value=1e4):
+        self.sub_buckets = sub_buckets
+        self.min_exp = math.frexp(min_value)[1]
+        self.max_exp = math.frexp(max_value)[1]
+        self.size = (self.max_exp - self.min_exp) * sub_buckets + 2
+        self.upper_bounds = self._build_upper_bounds()
+        self._shards = _ThreadShards(lambda: _HistogramShard(self.size), self._fold)
+
+    def _build_upper_bounds(self):
+        bounds = [math.ldexp(0.5, self.min_exp)]
+        for exp in range(self.min_exp, self.max_exp):
+            for sub in range(self.sub_buckets):
+                bounds.append(math.ldexp(0.5 + (sub + 1) / (2 * self.sub_buckets), exp))
+        bounds.append(math.inf)
+        return bounds
+
+    def bucket_index(self, value):
+        """Index of the bucket holding value"""
+        if value <= 0:
+            return 0
+        mantissa, exp = math.frexp(value)
+        if exp < self.min_exp:
+            return 0
+        if exp >= self.max_exp:
+            return self.size - 1
+        return 1 + (exp - self.min_exp) * self.sub_buckets + int((mantissa - 0.5) * 2 * self.sub_buckets)
+
+    def record(self, value):
+        """Record one value"""
+        shard = self._shards.get()
+        shard.counts[self.bucket_index(value)] += 1
+        shard.count += 1
+        shard.sum += value
+        if value < shard.min:
+            shard.min = value
+        if value > shard.max:
+            shard.max = value
+
+    @staticmethod
+    def _fold(into, shard):
+        for i, bucket_count in enumerate(shard.counts):
+            into.counts[i] += bucket_count
+        into.count += shard.count
+        into.sum += shard.sum
+        into.min = min(into.min, shard.min)
+        into.max = max(into.max, shard.max)
+
+    def snapshot(self):
+        """Get a merged copy of all threads' counts"""
+        total = _HistogramShard(self.size)
+        for shard in self._shards.collect():
+            copy = _HistogramShard(self.size)
+            copy.counts = list(shard.counts)
+            copy.count, copy.sum, copy.min, copy.max = shard.count, shard.sum, shard.min, shard.max
+            self._fold(total, copy)
+        return HistogramSnapshot(self.upper_bounds, total.counts, sum(total.counts), total.sum, total.min, total.max)
@@ -1,13 +1,178 @@
 """
 Logging configuration for the application
+
+Records are put on an in-memory queue by the calling thread and written to
+stdout by a background listener, so request and worker threads never block
+on log I/O. Settings come straight from the environment because config.py
+itself logs through this module.
 """
+import os
 import sys
+import json
+import time
+import queue
+import atexit
+import random
 import logging
+import threading
+import contextvars
+from logging.handlers import QueueHandler, QueueListener
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+LOG_MODULE_LEVELS = os.getenv("LOG_MODULE_LEVELS", "")
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10000))
+LOG_SAMPLE_BURST = int(os.getenv("LOG_SAMPLE_BURST", 0))
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", 1.0))
+LOG_SAMPLE_WINDOW = float(os.getenv("LOG_SAMPLE_WINDOW", 60))
+
+_log_context = contextvars.ContextVar("log_context", default={})
+
+def set_log_context(**fields):
+    """Add correlation fields to the current context; returns a token for reset_log_context"""
+    return _log_context.set({**_log_context.get(), **fields})
+
+def reset_log_context(token):
+    """Restore the correlation fields that were active before set_log_context"""
+    _log_context.reset(token)
+
+def parse_module_levels(spec):
+    """Parse 'gemini=WARNING,telegram_database=ERROR' into {module: level}"""
+    levels = {}
+    for item in spec.split(","):
+        if "=" in item:
+            module, level = item.split("=", 1)
+            levels[module.strip()] = logging.getLevelName(level.strip().upper())
+    return levels
+
+class ContextFilter(logging.Filter):
+    """Copy the active correlation fields onto each record"""
+
+    def filter(self, record):
+        record.context = _log_context.get()
+        return True
+
+class LevelAndSamplingFilter(logging.Filter):
+    """Per-module minimum levels plus sampling of chatty INFO/DEBUG call sites
+
+    Each call site logs its first burst records per window in full; after
+    that only a rate fraction is kept. WARNING and above are never sampled.
+    """
+
+    def __init__(self, default_level, module_levels, burst=0, rate=1.0, window=60):
+        super().__init__()
+        self.default_level = default_level
+        self.module_levels = module_levels
+        self.burst = burst
+        self.rate = rate
+        self.window = window
+        self.sampled_out = 0
+        self._sites = {}
+        self._window_start = time.monotonic()
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno < self.module_levels.get(record.module, self.default_level):
+            return False
+        if not self.burst or self.rate >= 1.0 or record.levelno >= logging.WARNING:
+            return True
+
+        site = (record.pathname, record.lineno)
+        with self._lock:
+            now = time.monotonic()
+            if now - self._window_start >= self.window:
+                self._sites = {}
+                self._window_start = now
+            count = self._sites.get(site, 0) + 1
+            self._sites[site] = count
+            if count <= self.burst or random.random() < self.rate:
+                return True
+            self.sampled_out += 1
+            return False
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[logging.StreamHandler(sys.stdout)]
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line with the correlation fields inlined"""
+
+    def format(self, record):
+        entry = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "module": record.module,
+            "line": record.lineno,
+            "thread": record.threadName,
+            "msg": record.getMessage(),
+            **getattr(record, "context", {})
+        }
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class TextFormatter(logging.Formatter):
+    """The original text format, with correlation fields appended when present"""
+
+    def format(self, record):
+        line = super().format(record)
+        context = getattr(record, "context", None)
+        if context:
+            line += " [" + " ".join(f"{key}={value}" for key, value in context.items()) + "]"
+        return line
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Queue handler that drops records instead of blocking when the queue is full"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # The listener runs in this process, so skip the default eager
+        # formatting; just merge args so later mutation cannot change the text
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+queue_handler = NonBlockingQueueHandler(log_queue)
+module_levels = parse_module_levels(LOG_MODULE_LEVELS)
+default_level = logging.getLevelName(LOG_LEVEL)
+sampling_filter = LevelAndSamplingFilter(
+    default_level,
+    module_levels,
+    burst=LOG_SAMPLE_BURST,
+    rate=LOG_SAMPLE_RATE,
+    window=LOG_SAMPLE_WINDOW
+)
+queue_handler.addFilter(sampling_filter)
+queue_handler.addFilter(ContextFilter())
+
+stream_handler = logging.StreamHandler(sys.stdout)
+stream_handler.setFormatter(
+    JsonFormatter() if LOG_FORMAT == "json"
+    else TextFormatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 )
 
-logger = logging.getLogger(__name__)
\ No newline at end of file
+# The root level is the most verbose of all settings so a module can be turned
+# up above LOG_LEVEL; the filter applies the real per-module threshold
+logging.basicConfig(level=min([default_level, *module_levels.values()]), handlers=[queue_handler], force=True)
+
+listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+listener.start()
+atexit.register(listener.stop)
+
+def log_stats():
+    """Get queue depth and dropped/sampled record counts"""
+    return {
+        "queued": log_queue.qsize(),
+        "dropped": queue_handler.dropped,
+        "sampled_out": sampling_filter.sampled_out,
+        "listener_alive": bool(listener._thread and listener._thread.is_alive())
+    }
+
+logger = logging.getLogger(__name__)
@@ -1,55 +1,308 @@
 """
 Metrics tracking for the bot
 """
-from collections import Counter
+import threading
+from utils.histogram import Histogram, ShardedCounter
+
+# (attribute, exported name, label names) for every ShardedCounter
+COUNTERS = (
+    ("total_messages", "messages_total", ("type",)),
+    ("errors", "errors_total", ("type",)),
+    ("throttled", "throttled_total", ("endpoint",)),
+    ("intake", "telegram_updates_total", ("outcome",)),
+    ("caches", "cache_events_total", ("cache", "event")),
+    ("db_errors", "db_pool_errors_total", ("pool", "error")),
+    ("tokens", "gemini_tokens_total", ("channel", "model", "request_type", "kind")),
+    ("http_responses", "http_responses_total", ("endpoint", "method", "status"))
+)
 
 class Metrics:
-    """Centralized metrics tracking"""
+    """Centralized metrics tracking
+
+    Counters and histograms are sharded per thread, so the track_* methods
+    are safe to call from request, executor and background threads alike.
+    """
 
     def __init__(self):
-        self.total_messages = Counter()
-        self.errors = Counter()
-        self.response_times = []
+        self.total_messages = ShardedCounter()
+        self.errors = ShardedCounter()
+        self.throttled = ShardedCounter()
+        self.intake = ShardedCounter()
+        self.caches = ShardedCounter()
+        self.db_errors = ShardedCounter()
+        self.tokens = ShardedCounter()
+        self.http_responses = ShardedCounter()
+        self.http_in_flight = {}
+        self.db_in_use = {}
+        self.db_pool_max = {}
+        self.gauges = {}
+        self.gauge_callbacks = {}
+        self.counter_callbacks = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name, **labels):
+        """Get (or create) the histogram series for name and labels"""
+        key = (name, tuple(sorted(labels.items())))
+        hist = self._histograms.get(key)
+        if hist is None:
+            with self._lock:
+                hist = self._histograms.setdefault(key, Histogram())
+        return hist
+
+    def observe(self, name, value, **labels):
+        """Record a value in a labelled histogram"""
+        self.histogram(name, **labels).record(value)
+
+    def series(self, name):
+        """Get snapshots of every label set recorded for a histogram"""
+        return {
+            labels: hist.snapshot()
+            for (series_name, labels), hist in list(self._histograms.items())
+            if series_name == name
+        }
+
+    def merged(self, name, series=None):
+        """Get one snapshot combining all label sets of a histogram"""
+        total = None
+        for snapshot in (series if series is not None else self.series(name)).values():
+            total = snapshot if total is None else total.merge(snapshot)
+        return total
 
     def track_message(self, message_type):
         """Track a message"""
-        self.total_messages[message_type] += 1
+        self.total_messages.inc(message_type)
 
     def track_error(self, error_type):
         """Track an error"""
-        self.errors[error_type] += 1
-
-    def track_response_time(self, time_seconds):
-        """Track response time"""
-        self.response_times.append(time_seconds)
-        if len(self.response_times) > 1000:
-            self.response_times = self.response_times[-1000:]
-    
-    def get_stats(self):
-        """Get metrics statistics"""
-        sorted_times = sorted(self.response_times)
-        
-        avg_time = (
-            sum(self.response_times) / len(self.response_times)
-            if self.response_times else 0
-        )
-
-        p50 = sorted_times[len(sorted_times) // 2] if sorted_times else 0
-        p95 = sorted_times[int(len(sorted_times) * 0.95)] if sorted_times else 0
-        p99 = sorted_times[int(len(sorted_times) * 0.99)] if sorted_times else 0
+        self.errors.inc(error_type)
+
+    def track_db_checkout(self, pool_name, wait_seconds, in_use):
+        """Track a database connection checkout"""
+        self.observe("db_checkout_wait", wait_seconds, pool=pool_name)
+        self.db_in_use[pool_name] = in_use
+
+    def track_db_in_use(self, pool_name, in_use):
+        """Track the number of checked-out database connections"""
+        self.db_in_use[pool_name] = in_use
+
+    def track_db_pool_size(self, pool_name, maxconn):
+        """Track the configured size of a database pool"""
+        self.db_pool_max[pool_name] = maxconn
+
+    def track_db_error(self, pool_name, error_type):
+        """Track a database pool error"""
+        self.db_errors.inc((pool_name, error_type))
+
+    def track_password_hash(self, operation, queue_seconds, total_seconds):
+        """Track a password hashing job and the time it waited for a worker"""
+        self.observe("password_hash_queue", queue_seconds, operation=operation)
+        self.observe("password_hash_total", total_seconds, operation=operation)
+
+    def track_throttled(self, endpoint):
+        """Track a request rejected by a throttle"""
+        self.throttled.inc(endpoint)
+
+    def track_api_latency(self, service, method, time_seconds):
+        """Track the latency of an outbound API call"""
+        self.observe("api_latency", time_seconds, service=service, method=method)
+
+    def track_intake(self, outcome, count=1):
+        """Track a Telegram update intake outcome"""
+        self.intake.inc(outcome, count)
+
+    def track_tokens(self, channel, model, request_type, kind, count):
+        """Track Gemini tokens (kind is prompt, output or cached)"""
+        self.tokens.inc((channel, model, request_type, kind), count)
+
+    def track_request_started(self, endpoint):
+        """Count a Flask request as in flight"""
+        with self._lock:
+            self.http_in_flight[endpoint] = self.http_in_flight.get(endpoint, 0) + 1
+
+    def track_request_finished(self, endpoint, method, status, time_seconds):
+        """Track a finished Flask request's latency and status code"""
+        with self._lock:
+            self.http_in_flight[endpoint] = self.http_in_flight.get(endpoint, 1) - 1
+        self.observe("http_request", time_seconds, endpoint=endpoint, method=method)
+        self.http_responses.inc((endpoint, method, str(status)))
+
+    def set_gauge(self, name, value):
+        """Set a point-in-time gauge value"""
+        self.gauges[name] = value
+
+    def register_gauge(self, name, callback):
+        """Register a gauge whose value is read from callback at export time"""
+        self.gauge_callbacks[name] = callback
+
+    def register_counter(self, name, callback):
+        """Register a monotonic count kept elsewhere, read from callback at export time"""
+        self.counter_callbacks[name] = callback
+
+    def track_cache(self, cache_name, event):
+        """Track a cache event (hits, misses, expired, evictions)"""
+        self.caches.inc((cache_name, event))
 
+    def track_response_time(self, time_seconds, channel="unknown", media_type="text"):
+        """Track an end-to-end response time"""
+        self.observe("response_time", time_seconds, channel=channel, media_type=media_type)
+
+    def export(self):
+        """Get raw counters, gauges and histogram snapshots keyed by label pairs"""
+        counters = {}
+        for attribute, name, label_names in COUNTERS:
+            counters[name] = {
+                tuple(zip(label_names, key if isinstance(key, tuple) else (key,))): value
+                for key, value in getattr(self, attribute).values().items()
+            }
+        for name, callback in list(self.counter_callbacks.items()):
+            counters[name] = {(): callback()}
+
+        gauges = {name: {(): value} for name, value in list(self.gauges.items())}
+        for name, callback in list(self.gauge_callbacks.items()):
+            gauges[name] = {(): callback()}
+        gauges["db_pool_connections_in_use"] = {(("pool", pool_name),): value for pool_name, value in list(self.db_in_use.items())}
+        gauges["db_pool_connections_max"] = {(("pool", pool_name),): value for pool_name, value in list(self.db_pool_max.items())}
+        gauges["http_requests_in_flight"] = {(("endpoint", endpoint),): value for endpoint, value in list(self.http_in_flight.items())}
+
+        histograms = {}
+        for (name, labels), hist in list(self._histograms.items()):
+            histograms.setdefault(f"{name}_seconds", {})[labels] = hist.snapshot()
+
+        return {"counters": counters, "gauges": gauges, "histograms": histograms}
+
+    @staticmethod
+    def summarize(snapshot, digits=3):
+        """Summarize a histogram snapshot"""
+        if snapshot is None or not snapshot.count:
+            return {"count": 0}
         return {
-            "total_messages": dict(self.total_messages),
-            "total_errors": dict(self.errors),
-            "total_error_count": sum(self.errors.values()),
-            "response_times": {
-                "avg_seconds": round(avg_time, 3),
-                "p50_seconds": round(p50, 3),
-                "p95_seconds": round(p95, 3),
-                "p99_seconds": round(p99, 3),
-                "min_seconds": round(min(sorted_times), 3) if sorted_times else 0,
-                "max_seconds": round(max(sorted_times), 3) if sorted_times else 0
+            "count": snapshot.count,
+            "avg_seconds": round(snapshot.mean, digits),
+            "p50_seconds": round(snapshot.percentile(50), digits),
+            "p95_seconds": round(snapshot.percentile(95), digits),
+            "p99_seconds": round(snapshot.percentile(99), digits),
+            "min_seconds": round(snapshot.min, digits),
+            "max_seconds": round(snapshot.max, digits)
+        }
+
+    @staticmethod
+    def _flat(series):
+        """Turn single-label series into a plain dict"""
+        return {labels[0][1] if labels else "": value for labels, value in series.items()}
+
+    @staticmethod
+    def _by(series, label):
+        """Key histogram snapshots by one label value"""
+        return {dict(labels)[label]: snapshot for labels, snapshot in series.items()}
+
+    def _db_pool_stats(self, export):
+        """Summarize checkout waits and errors per pool"""
+        errors = {}
+        for labels, count in export["counters"]["db_pool_errors_total"].items():
+            pool_errors = errors.setdefault(dict(labels)["pool"], {})
+            pool_errors[dict(labels)["error"]] = count
+        waits = self._by(export["histograms"].get("db_checkout_wait_seconds", {}), "pool")
+        in_use = {dict(labels)["pool"]: value for labels, value in export["gauges"]["db_pool_connections_in_use"].items()}
+
+        stats = {}
+        for pool_name in set(waits) | set(errors) | set(in_use):
+            wait = waits.get(pool_name)
+            stats[pool_name] = {
+                "checkouts": wait.count if wait else 0,
+                "avg_wait_seconds": round(wait.mean, 4) if wait else 0,
+                "p95_wait_seconds": round(wait.percentile(95), 4) if wait else 0,
+                "max_wait_seconds": round(wait.max, 4) if wait else 0,
+                "in_use": in_use.get(pool_name, 0),
+                "errors": errors.get(pool_name, {})
+            }
+        return stats
+
+    @staticmethod
+    def _cache_stats(export):
+        """Summarize cache events and hit rate per cache"""
+        caches = {}
+        for labels, count in export["counters"]["cache_events_total"].items():
+            caches.setdefault(dict(labels)["cache"], {})[dict(labels)["event"]] = count
+        for events in caches.values():
+            lookups = events.get("hits", 0) + events.get("misses", 0)
+            events["hit_rate"] = round(events.get("hits", 0) / lookups, 3) if lookups else 0
+        return caches
+
+    def _token_stats(self, export):
+        """Summarize Gemini tokens per channel/model/request type, with call latency by prompt size"""
+        tokens = {}
+        for labels, count in export["counters"]["gemini_tokens_total"].items():
+            labels = dict(labels)
+            key = f"{labels['channel']}/{labels['model']}/{labels['request_type']}"
+            tokens.setdefault(key, {})[labels["kind"]] = count
+        return {
+            "by_request": tokens,
+            "call_latency_by_prompt_size": {
+                "{request_type}/{prompt_size}".format(**dict(labels)): self.summarize(snapshot)
+                for labels, snapshot in export["histograms"].get("gemini_call_seconds", {}).items()
             }
         }
 
-metrics = Metrics()
\ No newline at end of file
+    def _http_stats(self, export):
+        """Summarize latency, status codes and in-flight requests per endpoint"""
+        endpoints = {}
+        for labels, snapshot in export["histograms"].get("http_request_seconds", {}).items():
+            labels = dict(labels)
+            endpoints[f"{labels['method']} {labels['endpoint']}"] = {**self.summarize(snapshot), "status": {}}
+        for labels, count in export["counters"].get("http_responses_total", {}).items():
+            labels = dict(labels)
+            entry = endpoints.setdefault(f"{labels['method']} {labels['endpoint']}", {"count": 0, "status": {}})
+            entry["status"][labels["status"]] = count
+        in_flight = {dict(labels)["endpoint"]: value for labels, value in export["gauges"].get("http_requests_in_flight", {}).items()}
+        return {"endpoints": endpoints, "in_flight": {endpoint: value for endpoint, value in in_flight.items() if value}}
+
+    def get_stats(self, export=None):
+        """Get metrics statistics, from this process or from a merged export"""
+        export = export or self.export()
+        counters = export["counters"]
+        histograms = export["histograms"]
+        errors = self._flat(counters["errors_total"])
+        response_series = histograms.get("response_time_seconds", {})
+        hash_queue = self._by(histograms.get("password_hash_queue_seconds", {}), "operation")
+        hash_totals = self._by(histograms.get("password_hash_total_seconds", {}), "operation")
+
+        return {
+            "total_messages": self._flat(counters["messages_total"]),
+            "total_errors": errors,
+            "total_error_count": sum(errors.values()),
+            "response_times": {
+                **self.summarize(self.merged("response_time", response_series)),
+                "by_label": {
+                    "/".join(value for _, value in labels): self.summarize(snapshot)
+                    for labels, snapshot in response_series.items()
+                }
+            },
+            "db_pools": self._db_pool_stats(export),
+            "password_hashing": {
+                operation: {
+                    "count": snapshot.count,
+                    "avg_queue_seconds": round(snapshot.mean, 4),
+                    "max_queue_seconds": round(snapshot.max, 4),
+                    "p95_queue_seconds": round(snapshot.percentile(95), 4),
+                    "avg_total_seconds": round(hash_totals[operation].mean, 4) if operation in hash_totals else 0
+                }
+                for operation, snapshot in hash_queue.items()
+            },
+            "throttled": self._flat(counters["throttled_total"]),
+            "intake": self._flat(counters["telegram_updates_total"]),
+            "gauges": {
+                name: series[()]
+                for name, series in export["gauges"].items()
+                if () in series and not name.startswith(("db_pool_", "http_"))
+            },
+            "api_latency": {
+                "{service}.{method}".format(**dict(labels)): self.summarize(snapshot)
+                for labels, snapshot in histograms.get("api_latency_seconds", {}).items()
+            },
+            "caches": self._cache_stats(export),
+            "gemini_tokens": self._token_stats(export),
+            "http": self._http_stats(export)
+        }
+
+metrics = Metrics()
@@ -0,0 +1,220 @@
+"""
+Per-worker metric shards for multi-process (gunicorn) deployments
+"""
+import os
+import json
+import time
+import fcntl
+import atexit
+import threading
+from config import Config
+from utils.logger import logger
+from utils.metrics import metrics, COUNTERS
+from utils.histogram import Histogram, HistogramSnapshot
+
+RETIRED_SHARD = "retired.json"
+LOCK_FILE = ".lock"
+
+_bounds = Histogram().upper_bounds
+_writer_thread = None
+
+def _labels_key(labels):
+    return tuple(tuple(pair) for pair in labels)
+
+def _snapshot_to_json(snapshot):
+    return {
+        "counts": {str(i): count for i, count in enumerate(snapshot.counts) if count},
+        "count": snapshot.count,
+        "sum": snapshot.sum,
+        "min": snapshot.min,
+        "max": snapshot.max
+    }
+
+def _snapshot_from_json(data):
+    counts = [0] * len(_bounds)
+    for i, count in data["counts"].items():
+        counts[int(i)] = count
+    return HistogramSnapshot(_bounds, counts, data["count"], data["sum"], data["min"], data["max"])
+
+def export_to_json(export):
+    """Convert a Metrics.export() dict to plain JSON data"""
+    return {
+        "counters": {name: [[labels, value] for labels, value in series.items()] for name, series in export["counters"].items()},
+        "gauges": {name: [[labels, value] for labels, value in series.items()] for name, series in export["gauges"].items()},
+        "histograms": {
+            name: [[labels, _snapshot_to_json(snapshot)] for labels, snapshot in series.items()]
+            for name, series in export["histograms"].items()
+        }
+    }
+
+def export_from_json(data):
+    """Convert JSON shard data back to a Metrics.export() dict"""
+    return {
+        "counters": {name: {_labels_key(labels): value for labels, value in series} for name, series in data["counters"].items()},
+        "gauges": {name: {_labels_key(labels): value for labels, value in series} for name, series in data.get("gauges", {}).items()},
+        "histograms": {
+            name: {_labels_key(labels): _snapshot_from_json(snapshot) for labels, snapshot in series}
+            for name, series in data["histograms"].items()
+        }
+    }
+
+def empty_export():
+    """An export with no samples"""
+    return {"counters": {}, "gauges": {}, "histograms": {}}
+
+def merge_exports(exports, include_gauges=True):
+    """Sum counters and gauges and merge histograms across exports"""
+    merged = empty_export()
+    for export in exports:
+        for kind in ("counters", "gauges") if include_gauges else ("counters",):
+            for name, series in export[kind].items():
+                target = merged[kind].setdefault(name, {})
+                for labels, value in series.items():
+                    target[labels] = target.get(labels, 0) + value
+        for name, series in export["histograms"].items():
+            target = merged["histograms"].setdefault(name, {})
+            for labels, snapshot in series.items():
+                target[labels] = target[labels].merge(snapshot) if labels in target else snapshot
+    for _, name, _ in COUNTERS:
+        merged["counters"].setdefault(name, {})
+    for name in ("db_pool_connections_in_use", "db_pool_connections_max"):
+        merged["gauges"].setdefault(name, {})
+    return merged
+
+def _shard_path(directory, pid):
+    return os.path.join(directory, f"worker-{pid}.json")
+
+def _read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning(f"⚠️  Unreadable metrics shard {path}: {e}")
+        return None
+
+def _write_json(path, data):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def write_shard(directory=None):
+    """Write this worker's metrics to its shard file"""
+    directory = directory or Config.METRICS_MULTIPROC_DIR
+    os.makedirs(directory, exist_ok=True)
+    _write_json(_shard_path(directory, os.getpid()), export_to_json(metrics.export()))
+
+class _DirectoryLock:
+    """Exclusive flock on the shard directory"""
+
+    def __init__(self, directory):
+        self.path = os.path.join(directory, LOCK_FILE)
+
+    def __enter__(self):
+        self._file = open(self.path, "a")
+        fcntl.flock(self._file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        self._file.close()
+
+def _dead_shards(directory):
+    """Shard files of workers that have exited"""
+    dead = []
+    for entry in os.scandir(directory):
+        if not (entry.name.startswith("worker-") and entry.name.endswith(".json")):
+            continue
+        pid = int(entry.name[len("worker-"):-len(".json")])
+        if pid == os.getpid():
+            continue
+        if not _pid_alive(pid):
+            dead.append(entry.path)
+    return dead
+
+def _retire(directory, dead):
+    """Fold the counters and histograms of the given shards into the retired shard (lock held)"""
+    if not dead:
+        return
+
+    retired_path = os.path.join(directory, RETIRED_SHARD)
+    retired = _read_json(retired_path)
+    exports = [export_from_json(retired)] if retired else []
+    for path in dead:
+        data = _read_json(path)
+        if data:
+            exports.append(export_from_json(data))
+    _write_json(retired_path, export_to_json(merge_exports(exports, include_gauges=False)))
+    for path in dead:
+        os.remove(path)
+    logger.info(f"♻️  Retired {len(dead)} metrics shard(s) from exited workers")
+
+def collect_export(directory=None):
+    """Merge this worker's live metrics with every other worker's shard and the retired totals"""
+    directory = directory or Config.METRICS_MULTIPROC_DIR
+    if not directory:
+        return metrics.export()
+
+    exports = [metrics.export()]
+    try:
+        os.makedirs(directory, exist_ok=True)
+        with _DirectoryLock(directory):
+            _retire(directory, _dead_shards(directory))
+            own_shard = os.path.basename(_shard_path(directory, os.getpid()))
+            now = time.time()
+            for entry in os.scandir(directory):
+                if not entry.name.endswith(".json") or entry.name == own_shard:
+                    continue
+                if entry.name != RETIRED_SHARD and now - entry.stat().st_mtime > Config.METRICS_SHARD_STALE_SECONDS:
+                    # A live worker that stopped refreshing; skip it rather than retire counts it still owns
+                    continue
+                data = _read_json(entry.path)
+                if data:
+                    exports.append(export_from_json(data))
+    except OSError as e:
+        logger.error(f"❌ Error reading metrics shards: {e}")
+    return merge_exports(exports)
+
+def _final_write():
+    """Flush this worker's shard at exit so its counts are retired, not lost"""
+    try:
+        write_shard()
+    except Exception as e:
+        logger.error(f"❌ Error writing final metrics shard: {e}")
+
+def shard_writer_loop():
+    """Background task: keep this worker's shard fresh"""
+    while True:
+        time.sleep(Config.METRICS_SHARD_INTERVAL)
+        try:
+            write_shard()
+        except Exception as e:
+            logger.error(f"❌ Error writing metrics shard: {e}")
+
+def start_shard_writer():
+    """Start the shard writer once per worker when multi-process metrics are enabled"""
+    global _writer_thread
+    if not Config.METRICS_MULTIPROC_DIR:
+        return
+    if _writer_thread and _writer_thread.is_alive():
+        return
+    os.makedirs(Config.METRICS_MULTIPROC_DIR, exist_ok=True)
+    leftover = _shard_path(Config.METRICS_MULTIPROC_DIR, os.getpid())
+    if os.path.exists(leftover):
+        with _DirectoryLock(Config.METRICS_MULTIPROC_DIR):
+            _retire(Config.METRICS_MULTIPROC_DIR, [leftover])
+    write_shard()
+    _writer_thread = threading.Thread(target=shard_writer_loop, name="metrics-shard-writer", daemon=True)
+    _writer_thread.start()
+    atexit.register(_final_write)
+    logger.info(f"✅ Multi-process metrics enabled ({Config.METRICS_MULTIPROC_DIR})")
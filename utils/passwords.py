@@ -0,0 +1,92 @@
+"""
+Password hashing on a bounded thread pool
+"""
+import time
+import bcrypt
+import threading
+from config import Config
+from utils.logger import logger
+from utils.metrics import metrics
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+_executor = None
+_executor_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(Config.PASSWORD_HASH_MAX_PENDING)
+
+class PasswordHasherBusy(Exception):
+    """Raised when too many hashing jobs are already pending or a job timed out"""
+
+def _hash_job(password, rounds, submitted_at):
+    """Hash a password (runs on a pool thread)"""
+    started_at = time.time()
+    hashed = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=rounds)).decode('utf-8')
+    return hashed, started_at - submitted_at
+
+def _verify_job(password, password_hash, submitted_at):
+    """Check a password against its hash (runs on a pool thread)"""
+    started_at = time.time()
+    valid = bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
+    return valid, started_at - submitted_at
+
+def _get_executor():
+    """Create the hashing pool on first use
+
+    bcrypt releases the GIL in hashpw and checkpw, so threads hash in
+    parallel without forking a process that is already running many threads.
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=Config.PASSWORD_HASH_WORKERS,
+                    thread_name_prefix="password_hash"
+                )
+                logger.info(f"✅ Password hashing pool started ({Config.PASSWORD_HASH_WORKERS} workers)")
+    return _executor
+
+def _run(operation, job, *args):
+    """Run a hashing job with bounded concurrency and record its queue time"""
+    if not _slots.acquire(timeout=Config.PASSWORD_HASH_TIMEOUT):
+        metrics.track_error("password_hash_busy")
+        raise PasswordHasherBusy("password hashing queue is full")
+
+    start = time.time()
+    if Config.PASSWORD_HASH_WORKERS <= 0:
+        try:
+            result, queue_seconds = job(*args, start)
+        finally:
+            _slots.release()
+    else:
+        try:
+            future = _get_executor().submit(job, *args, start)
+        except Exception:
+            _slots.release()
+            raise
+        # The slot is held until the job leaves the pool, not just until we stop
+        # waiting, so the semaphore keeps bounding the pool's backlog
+        future.add_done_callback(lambda _: _slots.release())
+        try:
+            result, queue_seconds = future.result(timeout=Config.PASSWORD_HASH_TIMEOUT)
+        except FutureTimeoutError:
+            future.cancel()
+            metrics.track_error("password_hash_timeout")
+            raise PasswordHasherBusy("password hashing timed out")
+
+    metrics.track_password_hash(operation, queue_seconds, time.time() - start)
+    return result
+
+def hash_password(password):
+    """Hash a password with the configured bcrypt cost"""
+    return _run("hash", _hash_job, password, Config.BCRYPT_ROUNDS)
+
+def verify_password(password, password_hash):
+    """Verify a password against a stored bcrypt hash"""
+    return _run("verify", _verify_job, password, password_hash)
+
+def needs_rehash(password_hash):
+    """Check whether a stored hash uses a different cost than configured"""
+    try:
+        return int(password_hash.split("$")[2]) != Config.BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return False
@@ -0,0 +1,126 @@
+"""
+In-process sampling profiler producing collapsed stacks
+"""
+import os
+import sys
+import time
+import threading
+from config import Config
+from collections import Counter
+
+# Leaf frames of threads that are blocked waiting rather than using CPU, used
+# when per-thread CPU clocks are not available
+IDLE_LEAVES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("selectors.py", "select"),
+    ("socket.py", "accept"),
+    ("socket.py", "readinto"),
+    ("ssl.py", "read"),
+    ("ssl.py", "recv_into"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+    ("connection.py", "wait")
+}
+
+class ProfilerBusy(Exception):
+    """Raised when a profiling session is already running in this process"""
+
+class SamplingProfiler:
+    """Samples every thread's stack with sys._current_frames
+
+    Only one session runs per process. The sampling loop runs in the calling
+    thread, which is left out of the samples. Unless include_idle is set, a
+    thread is only sampled when its CPU clock advanced since the previous
+    sample, so sleeping and blocked threads do not drown out busy ones.
+    """
+
+    def __init__(self, max_depth=64):
+        self.max_depth = max_depth
+        self._session = threading.Lock()
+
+    def _collapse(self, frame, thread_name):
+        """Turn a frame chain into a root-first 'thread;file:func;...' string"""
+        names = []
+        while frame is not None and len(names) < self.max_depth:
+            code = frame.f_code
+            names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+            frame = frame.f_back
+        names.append(thread_name)
+        names.reverse()
+        return ";".join(names)
+
+    @staticmethod
+    def _thread_cpu_time(ident):
+        """CPU seconds used by a thread, or None where per-thread clocks are unsupported"""
+        try:
+            return time.clock_gettime(time.pthread_getcpuclockid(ident))
+        except (AttributeError, OSError, OverflowError):
+            return None
+
+    def _is_idle(self, ident, frame, cpu_times):
+        """Whether a thread used no CPU since the last sample"""
+        cpu = self._thread_cpu_time(ident)
+        if cpu is not None:
+            previous = cpu_times.get(ident)
+            cpu_times[ident] = cpu
+            if previous is not None:
+                return cpu <= previous
+        code = frame.f_code
+        return (os.path.basename(code.co_filename), code.co_name) in IDLE_LEAVES
+
+    def profile(self, seconds, rate_hz, include_idle=False):
+        """Sample for seconds at rate_hz and return collapsed stack counts"""
+        if not self._session.acquire(blocking=False):
+            raise ProfilerBusy("a profiling session is already running")
+        try:
+            own_ident = threading.get_ident()
+            interval = 1.0 / rate_hz
+            stacks = Counter()
+            samples = 0
+            sampling_time = 0.0
+            thread_names = {}
+            cpu_times = {}
+            names_refreshed = 0.0
+            start = time.perf_counter()
+            deadline = start + seconds
+            next_sample = start
+
+            while True:
+                now = time.perf_counter()
+                if now >= deadline:
+                    break
+                if now - names_refreshed >= 1.0:
+                    thread_names = {t.ident: t.name for t in threading.enumerate()}
+                    names_refreshed = now
+
+                for ident, frame in sys._current_frames().items():
+                    if ident == own_ident or (not include_idle and self._is_idle(ident, frame, cpu_times)):
+                        continue
+                    stacks[self._collapse(frame, thread_names.get(ident, str(ident)))] += 1
+                samples += 1
+                sampling_time += time.perf_counter() - now
+
+                next_sample += interval
+                delay = next_sample - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    next_sample = time.perf_counter()
+
+            elapsed = time.perf_counter() - start
+            return {
+                "duration_seconds": round(elapsed, 3),
+                "rate_hz": rate_hz,
+                "samples": samples,
+                "overhead_ratio": round(sampling_time / elapsed, 4) if elapsed else 0,
+                "stacks": stacks
+            }
+        finally:
+            self._session.release()
+
+def to_collapsed(stacks):
+    """Render stack counts in the collapsed format read by flamegraph.pl and speedscope"""
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+profiler = SamplingProfiler(max_depth=Config.PROFILER_MAX_DEPTH)
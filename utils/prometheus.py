@@ -0,0 +1,89 @@
+"""
+Prometheus text exposition format rendering
+"""
+import re
+import math
+
+PREFIX = "afaq_"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Coarse buckets for exposition; the in-process histograms are much finer and
+# each le count includes every fine bucket whose upper bound is at or below it
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+HELP = {
+    "messages_total": "Messages handled, by type",
+    "errors_total": "Errors, by type",
+    "throttled_total": "Requests rejected by a throttle, by endpoint",
+    "telegram_updates_total": "Telegram update intake outcomes",
+    "cache_events_total": "Cache hits, misses, expirations and evictions",
+    "db_pool_errors_total": "Database pool errors, by pool and error",
+    "db_pool_connections_in_use": "Checked-out database connections",
+    "db_pool_connections_max": "Database pool size",
+    "active_conversations": "Conversations held in memory",
+    "log_queue_depth": "Log records waiting for the background writer",
+    "log_records_dropped_total": "Log records dropped because the log queue was full",
+    "response_time_seconds": "End-to-end Gemini response time",
+    "api_latency_seconds": "Outbound API call latency",
+    "db_checkout_wait_seconds": "Time spent waiting for a database connection",
+    "password_hash_queue_seconds": "Time password hashing jobs waited for a worker",
+    "password_hash_total_seconds": "Total password hashing time",
+    "stage_duration_seconds": "Duration of each pipeline stage",
+    "gemini_tokens_total": "Gemini tokens by channel, model, request type and kind",
+    "gemini_call_seconds": "Gemini generate_content latency by request type and prompt size",
+    "http_request_seconds": "Flask request latency by endpoint and method",
+    "http_responses_total": "Flask responses by endpoint, method and status code",
+    "http_requests_in_flight": "Flask requests currently being handled, by endpoint"
+}
+
+def metric_name(name):
+    """Sanitize a metric name and add the prefix"""
+    return PREFIX + re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(labels, extra=None):
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+def _number(value):
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+def _header(lines, name, kind):
+    help_key = name[len(PREFIX):]
+    lines.append(f"# HELP {name} {HELP.get(help_key, help_key.replace('_', ' '))}")
+    lines.append(f"# TYPE {name} {kind}")
+
+def render(export):
+    """Render a Metrics.export() dict as Prometheus text"""
+    lines = []
+    for name, series in sorted(export["counters"].items()):
+        full_name = metric_name(name)
+        _header(lines, full_name, "counter")
+        for labels, value in sorted(series.items()):
+            lines.append(f"{full_name}{_labels(labels)} {_number(value)}")
+
+    for name, series in sorted(export["gauges"].items()):
+        full_name = metric_name(name)
+        _header(lines, full_name, "gauge")
+        for labels, value in sorted(series.items()):
+            lines.append(f"{full_name}{_labels(labels)} {_number(value)}")
+
+    for name, series in sorted(export["histograms"].items()):
+        full_name = metric_name(name)
+        _header(lines, full_name, "histogram")
+        for labels, snapshot in sorted(series.items()):
+            for bound, count in zip(BUCKETS, snapshot.cumulative(BUCKETS)):
+                lines.append(f"{full_name}_bucket{_labels(labels, ('le', _number(float(bound))))} {count}")
+            lines.append(f"{full_name}_bucket{_labels(labels, ('le', '+Inf'))} {snapshot.count}")
+            lines.append(f"{full_name}_sum{_labels(labels)} {_number(snapshot.sum)}")
+            lines.append(f"{full_name}_count{_labels(labels)} {snapshot.count}")
+
+    return "\n".join(lines) + "\n"
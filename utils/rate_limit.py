@@ -0,0 +1,107 @@
+"""
+In-memory request throttling
+"""
+import math
+import time
+import threading
+from collections import OrderedDict
+from utils.metrics import metrics
+
+class TokenBucket:
+    """Thread-safe token bucket that hands out send reservations"""
+
+    def __init__(self, rate_per_second, burst=None):
+        self.rate = rate_per_second
+        self.burst = burst or max(1, int(rate_per_second))
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Take a token and return how many seconds to wait before using it"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+class Throttle:
+    """Token bucket with progressive backoff after repeated failures
+
+    Each key (e.g. a username or client IP) gets a bucket of `burst` tokens
+    refilled at `rate_per_minute`. After `free_failures` consecutive failures
+    the key is blocked for backoff_base * 2^n seconds, capped at backoff_max.
+    """
+
+    def __init__(self, name, rate_per_minute, burst, free_failures=3,
+                 backoff_base=1.0, backoff_max=300.0, max_keys=50000):
+        self.name = name
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self.free_failures = free_failures
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_keys = max_keys
+        self._keys = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _state(self, key, now):
+        """Get the refilled state for a key, creating it if needed"""
+        state = self._keys.get(key)
+        if state is None:
+            state = {"tokens": float(self.burst), "updated": now, "failures": 0, "blocked_until": 0.0}
+            self._keys[key] = state
+            while len(self._keys) > self.max_keys:
+                self._keys.popitem(last=False)
+        else:
+            self._keys.move_to_end(key)
+            state["tokens"] = min(self.burst, state["tokens"] + (now - state["updated"]) * self.rate)
+            state["updated"] = now
+        return state
+
+    def check(self, *keys):
+        """Consume one attempt for every key, or return seconds to wait if throttled"""
+        keys = [key for key in keys if key]
+        now = time.monotonic()
+        with self._lock:
+            states = [self._state(key, now) for key in keys]
+            wait = 0.0
+            for state in states:
+                if state["blocked_until"] > now:
+                    wait = max(wait, state["blocked_until"] - now)
+                if state["tokens"] < 1:
+                    wait = max(wait, (1 - state["tokens"]) / self.rate)
+
+            if wait > 0:
+                metrics.track_throttled(self.name)
+                return math.ceil(wait)
+
+            for state in states:
+                state["tokens"] -= 1
+        return 0
+
+    def record_failure(self, *keys):
+        """Register a failed attempt and extend the backoff for each key"""
+        now = time.monotonic()
+        with self._lock:
+            for key in keys:
+                if not key:
+                    continue
+                state = self._state(key, now)
+                state["failures"] += 1
+                excess = state["failures"] - self.free_failures
+                if excess >= 0:
+                    # Cap the exponent: 2 ** 1024 overflows a float, and 2 ** 32
+                    # already exceeds any sensible backoff_max
+                    delay = min(self.backoff_max, self.backoff_base * (2 ** min(excess, 32)))
+                    state["blocked_until"] = now + delay
+
+    def record_success(self, *keys):
+        """Clear the failure streak for each key"""
+        with self._lock:
+            for key in keys:
+                state = self._keys.get(key)
+                if state:
+                    state["failures"] = 0
+                    state["blocked_until"] = 0.0
@@ -0,0 +1,84 @@
+"""
+Per-route request timing and slow request capture
+"""
+import time
+import threading
+from collections import deque
+from datetime import datetime
+from flask import request, g
+from config import Config
+from utils.logger import logger
+from utils.metrics import metrics
+from utils.tracing import start_trace_capture, end_trace_capture
+
+class SlowRequestLog:
+    """Bounded ring buffer of the most recent slow requests"""
+
+    def __init__(self, threshold_seconds=2.0, size=100):
+        self.threshold_seconds = threshold_seconds
+        self._entries = deque(maxlen=size)
+        self._lock = threading.Lock()
+        self.captured = 0
+
+    def add(self, entry):
+        with self._lock:
+            self._entries.append(entry)
+            self.captured += 1
+
+    def entries(self, limit=None):
+        """Get captured requests, newest first"""
+        with self._lock:
+            entries = list(self._entries)
+        entries.reverse()
+        return entries[:limit] if limit else entries
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+slow_requests = SlowRequestLog(threshold_seconds=Config.SLOW_REQUEST_SECONDS, size=Config.SLOW_REQUEST_BUFFER_SIZE)
+
+def _endpoint_label():
+    """Route template (bounded cardinality) rather than the raw path"""
+    return request.url_rule.rule if request.url_rule else "unmatched"
+
+def start_request_timing():
+    g.request_start = time.perf_counter()
+    g.request_endpoint = _endpoint_label()
+    g.trace_capture = start_trace_capture()
+    metrics.track_request_started(g.request_endpoint)
+
+def remember_status(response):
+    g.response_status = response.status_code
+    return response
+
+def finish_request_timing(exc):
+    if "request_start" not in g:
+        return
+    duration = time.perf_counter() - g.pop("request_start")
+    status = g.get("response_status", 500)
+    traces = end_trace_capture(g.pop("trace_capture"))
+
+    try:
+        metrics.track_request_finished(g.request_endpoint, request.method, status, duration)
+        if duration >= slow_requests.threshold_seconds:
+            slow_requests.add({
+                "time": datetime.now().isoformat(),
+                "request_id": g.get("request_id"),
+                "method": request.method,
+                "path": request.path,
+                "endpoint": g.request_endpoint,
+                "status": status,
+                "duration_ms": round(duration * 1000, 2),
+                "error": type(exc).__name__ if exc else None,
+                "traces": traces
+            })
+            logger.warning(f"🐢 Slow request {request.method} {request.path} took {duration:.2f}s (status {status})")
+    except Exception as e:
+        logger.error(f"❌ Error recording request timing: {e}")
+
+def register_request_timing(app):
+    """Install the before/after/teardown hooks on the Flask app"""
+    app.before_request(start_request_timing)
+    app.after_request(remember_status)
+    app.teardown_request(finish_request_timing)
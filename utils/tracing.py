@@ -0,0 +1,119 @@
+"""
+Lightweight per-stage timing spans
+"""
+import json
+import time
+import uuid
+import random
+import contextvars
+from contextlib import contextmanager
+from config import Config
+from utils.logger import logger, set_log_context, reset_log_context
+from utils.metrics import metrics
+
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+_trace_sink = contextvars.ContextVar("trace_sink", default=None)
+_current_stage = contextvars.ContextVar("current_stage", default="")
+
+class Trace:
+    """Timings of the stages of one request"""
+
+    def __init__(self, pipeline, **attributes):
+        self.pipeline = pipeline
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.attributes = attributes
+        self.start = time.perf_counter()
+        self.spans = []
+
+    def to_dict(self, total):
+        return {
+            "trace_id": self.trace_id,
+            "pipeline": self.pipeline,
+            "total_ms": round(total * 1000, 2),
+            **self.attributes,
+            "spans": [
+                {
+                    "stage": stage,
+                    "parent": parent or None,
+                    "start_ms": round(offset * 1000, 2),
+                    "duration_ms": round(duration * 1000, 2),
+                    "error": error
+                }
+                for stage, parent, offset, duration, error in self.spans
+            ]
+        }
+
+class SpanTiming:
+    """Duration of a finished span, available after the with block"""
+    __slots__ = ("duration",)
+
+    def __init__(self):
+        self.duration = None
+
+def current_trace():
+    """Get the trace active in this thread, if any"""
+    return _current_trace.get()
+
+def start_trace_capture():
+    """Collect every trace finished in this context from now on; returns a token for end_trace_capture"""
+    return _trace_sink.set([])
+
+def end_trace_capture(token):
+    """Stop collecting and return the finished traces as dicts"""
+    traces = _trace_sink.get() or []
+    _trace_sink.reset(token)
+    return traces
+
+def record_stage(pipeline, stage, seconds, parent=""):
+    """Record a stage duration measured outside a span; parent names the enclosing stage, if any"""
+    metrics.observe("stage_duration", seconds, pipeline=pipeline, stage=stage, parent=parent)
+
+@contextmanager
+def span(stage):
+    """Time a stage of the active trace (or a standalone stage when none is active)"""
+    trace = _current_trace.get()
+    parent = _current_stage.get()
+    stage_token = _current_stage.set(stage)
+    timing = SpanTiming()
+    start = time.perf_counter()
+    error = None
+    try:
+        yield timing
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        _current_stage.reset(stage_token)
+        duration = timing.duration = time.perf_counter() - start
+        record_stage(trace.pipeline if trace else "none", stage, duration, parent)
+        if trace:
+            trace.spans.append((stage, parent, start - trace.start, duration, error))
+
+@contextmanager
+def trace(pipeline, **attributes):
+    """Start a trace for a request; nested calls join the trace already running"""
+    if _current_trace.get() is not None:
+        yield _current_trace.get()
+        return
+
+    current = Trace(pipeline, **attributes)
+    token = _current_trace.set(current)
+    log_token = set_log_context(trace_id=current.trace_id, **attributes)
+    try:
+        yield current
+    finally:
+        reset_log_context(log_token)
+        _current_trace.reset(token)
+        total = time.perf_counter() - current.start
+        record_stage(pipeline, "total", total)
+        sink = _trace_sink.get()
+        if sink is not None:
+            sink.append(current.to_dict(total))
+        _maybe_log(current, total)
+
+def _maybe_log(current, total):
+    """Emit a structured trace log line for sampled or slow requests"""
+    slow = Config.TRACE_LOG_SLOW_SECONDS and total >= Config.TRACE_LOG_SLOW_SECONDS
+    sampled = Config.TRACE_LOG_SAMPLE_RATE and random.random() < Config.TRACE_LOG_SAMPLE_RATE
+    if slow or sampled:
+        logger.info(f"🧭 trace {json.dumps(current.to_dict(total), ensure_ascii=False)}")
@@ -1,49 +1,42 @@
 """
 Web conversations database operations
 """
-from psycopg2 import pool
 from config import Config
+from database_pool import create_pool, execute_prepared, stream_rows, active_since_clause
 from utils.logger import logger
 from psycopg2.extras import Json
 
 web_db_pool = None
 
+UPSERT_WEB_CONVERSATION_SQL = """
+    INSERT INTO web_conversations (user_id, history, updated_at)
+    VALUES ($1, $2, CURRENT_TIMESTAMP)
+    ON CONFLICT (user_id)
+    DO UPDATE SET
+        history = EXCLUDED.history,
+        updated_at = CURRENT_TIMESTAMP
+"""
+
 def init_web_db_pool():
     """Initialize web database connection pool"""
     global web_db_pool
-    
-    if not Config.WEB_DATABASE_URL:
-        logger.warning("⚠️  No web database configured")
-        return
-    
-    try:
-        web_db_pool = pool.ThreadedConnectionPool(
-            minconn=1,
-            maxconn=5,
-            dsn=Config.WEB_DATABASE_URL
-        )
-        logger.info("✅ Web database connection pool created")
-    except Exception as e:
-        logger.error(f"❌ Failed to create web database pool: {e}")
-        web_db_pool = None
+    web_db_pool = create_pool(
+        "web",
+        Config.WEB_DATABASE_URL,
+        minconn=Config.WEB_DB_POOL_MIN,
+        maxconn=Config.WEB_DB_POOL_MAX
+    )
 
 def get_web_db_connection():
     """Get a connection from web database pool"""
     if web_db_pool:
-        try:
-            return web_db_pool.getconn()
-        except Exception as e:
-            logger.error(f"Error getting web DB connection: {e}")
-            return None
+        return web_db_pool.getconn()
     return None
 
 def release_web_db_connection(conn):
     """Release connection back to web database pool"""
     if web_db_pool and conn:
-        try:
-            web_db_pool.putconn(conn)
-        except Exception as e:
-            logger.error(f"Error releasing web DB connection: {e}")
+        web_db_pool.putconn(conn)
 
 def init_web_database_tables():
     """Initialize web database tables (conversations only)"""
@@ -72,6 +65,11 @@ def init_web_database_tables():
                 ON web_conversations(user_id)
             """)
             
+            cur.execute("""
+                CREATE INDEX IF NOT EXISTS idx_web_conv_updated_at 
+                ON web_conversations(updated_at)
+            """)
+            
             conn.commit()
         logger.info("✅ Web database tables initialized")
     except Exception as e:
@@ -90,16 +88,14 @@ def save_web_conversation(user_id, history):
         return False
     
     try:
+        conn.autocommit = True
         with conn.cursor() as cur:
-            cur.execute("""
-                INSERT INTO web_conversations (user_id, history, updated_at)
-                VALUES (%s, %s, CURRENT_TIMESTAMP)
-                ON CONFLICT (user_id) 
-                DO UPDATE SET 
-                    history = EXCLUDED.history,
-                    updated_at = CURRENT_TIMESTAMP
-            """, (user_id, Json(history)))
-        conn.commit()
+            execute_prepared(
+                cur,
+                "upsert_web_conversation",
+                UPSERT_WEB_CONVERSATION_SQL,
+                (user_id, Json(history))
+            )
         return True
     except Exception as e:
         logger.error(f"Error saving web conversation: {e}")
@@ -156,8 +152,12 @@ def clear_web_conversation(user_id):
     finally:
         release_web_db_connection(conn)
 
-def load_all_web_conversations():
-    """Load all web conversations"""
+def load_all_web_conversations(active_within_days=None, batch_size=None):
+    """Load web conversations in server-side cursor batches
+
+    active_within_days limits the load to conversations updated recently
+    (defaults to Config.HISTORY_LOAD_ACTIVE_DAYS, 0 loads everything).
+    """
     if not Config.WEB_DATABASE_URL:
         return {}
     
@@ -165,16 +165,29 @@ def load_all_web_conversations():
     if not conn:
         return {}
     
+    if active_within_days is None:
+        active_within_days = Config.HISTORY_LOAD_ACTIVE_DAYS
+    batch_size = batch_size or Config.HISTORY_LOAD_BATCH_SIZE
+    where, params = active_since_clause(active_within_days)
+    
     conversations = {}
     try:
-        with conn.cursor() as cur:
-            cur.execute("SELECT user_id, history FROM web_conversations")
-            rows = cur.fetchall()
-            for user_id, hist in rows:
-                conversations[f"web:{user_id}"] = hist
+        rows = stream_rows(
+            conn,
+            "load_web_conversations",
+            f"SELECT user_id, history FROM web_conversations{where}",
+            params,
+            batch_size
+        )
+        for user_id, hist in rows:
+            conversations[f"web:{user_id}"] = hist
+            if len(conversations) % (batch_size * 10) == 0:
+                logger.info(f"⏳ Loaded {len(conversations)} web conversations so far...")
+        conn.commit()
         logger.info(f"✅ Loaded {len(conversations)} web conversations")
     except Exception as e:
         logger.error(f"❌ Error loading web conversations: {e}")
+        conn.rollback()
     finally:
         release_web_db_connection(conn)
     